@@ -1,15 +1,37 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple
 import httpx
 import os
-from datetime import datetime
-from websearch_agent import WebSearchAgent
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from semantic_cache import SemanticResponseCache
 import uuid
 import re
+from cachetools import TTLCache
+import numpy as np
+import orjson
 
-app = FastAPI(title="Perplexity Clone API", version="1.0.0")
+# LangChain/OpenAI are heavy to import, so they are loaded on first use instead
+if TYPE_CHECKING:
+    from langchain.memory import ConversationTokenBufferMemory
+    from websearch_agent import WebSearchAgent
+
+class UTCJSONResponse(ORJSONResponse):
+    """ORJSONResponse that renders datetimes as UTC with a trailing Z."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z)
+
+log = logging.getLogger(__name__)
+
+app = FastAPI(title="Perplexity Clone API", version="1.0.0", default_response_class=UTCJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -20,34 +42,119 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize the web search agent
-web_agent = None
-
-def get_web_agent():
-    """Initialize and return the web search agent."""
-    global web_agent
-    if web_agent is None:
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            raise HTTPException(
-                status_code=500, 
-                detail="OPENAI_API_KEY not configured. Please set this environment variable."
-            )
-        
-        amplitude_api_key = os.getenv("AMPLITUDE_API_KEY", "demo_key")
-        amplitude_server_url = os.getenv("AMPLITUDE_SERVER_URL")  # Optional: for local development
-        
-        web_agent = WebSearchAgent(
-            openai_api_key=openai_api_key,
-            amplitude_api_key=amplitude_api_key,
-            model_name="gpt-4o-mini",
-            temperature=0.1,
-            amplitude_server_url=amplitude_server_url
+# Compress larger JSON bodies (SSE streams are left uncompressed by Starlette)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Number of WebSearchAgent instances shared across concurrent requests
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "8"))
+
+@app.on_event("startup")
+async def init_http_client():
+    """Create the keep-alive HTTP clients shared by every agent and the embedder.
+    
+    The async client serves the agents' LLM calls, which are awaited on the event loop.
+    """
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+    timeout = httpx.Timeout(30, connect=10)
+    app.state.http_client = httpx.Client(limits=limits, timeout=timeout)
+    app.state.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Close pooled connections when the worker shuts down."""
+    app.state.http_client.close()
+    await app.state.http_async_client.aclose()
+
+@app.on_event("startup")
+async def init_agent_pool():
+    """Prepare the per-worker agent pool; agents are created on first use."""
+    app.state.agent_pool = None
+    app.state.agent_pool_lock = asyncio.Lock()
+
+def create_web_agent() -> "WebSearchAgent":
+    """Initialize and return a new web search agent."""
+    from websearch_agent import WebSearchAgent
+    
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        raise HTTPException(
+            status_code=500, 
+            detail="OPENAI_API_KEY not configured. Please set this environment variable."
         )
-        web_agent.start_conversation()
+    
+    amplitude_api_key = os.getenv("AMPLITUDE_API_KEY", "demo_key")
+    amplitude_server_url = os.getenv("AMPLITUDE_SERVER_URL")  # Optional: for local development
+    
+    web_agent = WebSearchAgent(
+        openai_api_key=openai_api_key,
+        amplitude_api_key=amplitude_api_key,
+        model_name="gpt-4o-mini",
+        temperature=0.1,
+        amplitude_server_url=amplitude_server_url,
+        http_client=app.state.http_client,
+        http_async_client=app.state.http_async_client
+    )
+    web_agent.start_conversation()
     
     return web_agent
 
+async def get_agent_pool() -> asyncio.Queue:
+    """Return the agent pool, filling it with AGENT_POOL_SIZE agents on first use."""
+    if app.state.agent_pool is None:
+        async with app.state.agent_pool_lock:
+            if app.state.agent_pool is None:
+                pool = asyncio.Queue(maxsize=AGENT_POOL_SIZE)
+                agents = [await run_in_threadpool(create_web_agent) for _ in range(AGENT_POOL_SIZE)]
+                for agent in agents:
+                    pool.put_nowait(agent)
+                # Agents share one LLM, so any of them can create memories for the conversations
+                app.state.create_memory = agents[0]._create_memory
+                app.state.agent_pool = pool
+    
+    return app.state.agent_pool
+
+# Conversation memories by conversation ID, so follow-ups see their own history whichever agent answers them
+CONVERSATION_TTL_SECONDS = 3600
+conversation_memories = TTLCache(maxsize=10_000, ttl=CONVERSATION_TTL_SECONDS)
+
+async def get_conversation_memory(conversation_id: str) -> "ConversationTokenBufferMemory":
+    """Return the memory for a conversation, starting an empty one if it is unknown."""
+    memory = conversation_memories.get(conversation_id)
+    if memory is None:
+        await get_agent_pool()
+        memory = conversation_memories.setdefault(conversation_id, app.state.create_memory())
+    return memory
+
+# Response caches: exact matches on the normalized query, then near-duplicates by embedding;
+# only a conversation's first question is cached, since follow-ups depend on its history
+SEARCH_CACHE_TTL_SECONDS = 3600
+SEMANTIC_CACHE_THRESHOLD = 0.92
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+query_embedder = None
+
+def embed_query(text: str) -> List[float]:
+    """Embed a query for the semantic cache, creating the embedder on first use."""
+    global query_embedder
+    if query_embedder is None:
+        from langchain_openai import OpenAIEmbeddings
+        query_embedder = OpenAIEmbeddings(model=EMBEDDING_MODEL, http_client=app.state.http_client)
+    return query_embedder.embed_query(text)
+
+exact_cache = TTLCache(maxsize=10_000, ttl=SEARCH_CACHE_TTL_SECONDS)
+semantic_cache = SemanticResponseCache(
+    embed_query,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=SEARCH_CACHE_TTL_SECONDS
+)
+
+# Captures the host part of any http(s) URL in agent responses
+URL_PATTERN = re.compile(r'https?://([^\s/]+)')
+
+def search_cache_key(query: "SearchQuery") -> str:
+    """Build the cache key: the lowercased, whitespace-collapsed query."""
+    return " ".join(query.query.lower().split())
+
 # Pydantic models
 class SearchQuery(BaseModel):
     query: str
@@ -71,22 +178,25 @@ class HealthResponse(BaseModel):
     status: str
     message: str
 
+# Health responses never change, so they are rendered once at import
+ROOT_RESPONSE = UTCJSONResponse({"status": "healthy", "message": "Perplexity Clone API is running"})
+HEALTH_RESPONSE = UTCJSONResponse({"status": "healthy", "message": "API is operational"})
+
 @app.get("/", response_model=HealthResponse)
 async def root():
-    return HealthResponse(status="healthy", message="Perplexity Clone API is running")
+    return ROOT_RESPONSE
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    return HealthResponse(status="healthy", message="API is operational")
+    return HEALTH_RESPONSE
 
 def extract_sources_from_response(response_text: str) -> List[str]:
     """Extract domain sources from the agent response."""
     # Simple regex to find URLs in the response
-    url_pattern = r'https?://([^\s/]+)'
-    matches = re.findall(url_pattern, response_text)
+    matches = URL_PATTERN.findall(response_text)
     
-    # Extract unique domains
-    domains = list(set([match.split('/')[0] for match in matches]))
+    # Extract unique domains, keeping first-seen order
+    domains = list(dict.fromkeys(match.split('/', 1)[0] for match in matches))
     
     # If no URLs found, return some common sources (fallback)
     if not domains:
@@ -95,7 +205,10 @@ def extract_sources_from_response(response_text: str) -> List[str]:
     return domains[:5]  # Limit to 5 sources
 
 def create_mock_search_results(query: str, response_text: str) -> List[SearchResult]:
-    """Create mock search results based on the agent response."""
+    """Create mock search results based on the agent response.
+    
+    Results are built from data produced here, so they skip Pydantic validation.
+    """
     # For now, create some generic search results
     # In a more sophisticated implementation, you could parse the actual search results
     # from the agent's internal search calls
@@ -105,7 +218,7 @@ def create_mock_search_results(query: str, response_text: str) -> List[SearchRes
     
     # Create mock results based on sources found
     for i, source in enumerate(sources[:3], 1):
-        results.append(SearchResult(
+        results.append(SearchResult.model_construct(
             title=f"Search Result {i} for '{query}'",
             url=f"https://{source}",
             snippet=f"Information from {source} related to your query about {query}.",
@@ -114,7 +227,7 @@ def create_mock_search_results(query: str, response_text: str) -> List[SearchRes
     
     # If no sources, create a generic result
     if not results:
-        results.append(SearchResult(
+        results.append(SearchResult.model_construct(
             title=f"Web Search Results for '{query}'",
             url="https://web-search-results.com",
             snippet="Comprehensive information gathered from web search.",
@@ -123,61 +236,248 @@ def create_mock_search_results(query: str, response_text: str) -> List[SearchRes
     
     return results
 
+async def find_cached_response(query: SearchQuery) -> Tuple[Optional[SearchResponse], Optional[np.ndarray]]:
+    """Look the query up in the exact then semantic cache; returns the hit and the query embedding.
+    
+    The embedding is None if the query couldn't be embedded; the cache is skipped rather than failing the search.
+    """
+    cache_key = search_cache_key(query)
+    cached = exact_cache.get(cache_key)
+    embedding = None
+    if cached is None:
+        try:
+            embedding = await run_in_threadpool(semantic_cache.embed, cache_key)
+        except Exception as e:
+            log.warning("⚠️  Semantic cache skipped: %s", e)
+        else:
+            cached = semantic_cache.lookup(embedding)
+            if cached is not None:
+                exact_cache[cache_key] = cached
+    if cached is not None:
+        cached = cached.model_copy(update={
+            "query": query.query,
+            "conversation_id": query.conversation_id,
+            "timestamp": datetime.now(timezone.utc)
+        })
+    
+    return cached, embedding
+
+def cache_response(query: SearchQuery, embedding: Optional[np.ndarray], response: SearchResponse) -> None:
+    """Populate both cache tiers after a miss; only the exact tier without an embedding."""
+    cache_key = search_cache_key(query)
+    exact_cache[cache_key] = response
+    if embedding is not None:
+        semantic_cache.add(embedding, response)
+
+def with_conversation_id(query: SearchQuery) -> SearchQuery:
+    """Give a query that starts a conversation its ID up front, so its memory is kept under the ID returned."""
+    if query.conversation_id:
+        return query
+    return query.model_copy(update={"conversation_id": str(uuid.uuid4())})
+
+def starts_conversation(memory: "ConversationTokenBufferMemory") -> bool:
+    """Whether the conversation has no history yet, so its answer can be cached and reused."""
+    return not memory.chat_memory.messages
+
+def remember_cached_answer(memory: "ConversationTokenBufferMemory", query: SearchQuery, response: SearchResponse) -> None:
+    """Add a cached answer to the conversation memory, as the agent does for the answers it runs."""
+    memory.save_context({"input": query.query}, {"output": response.ai_summary})
+
+async def ask_agent(
+    query: SearchQuery,
+    memory: "ConversationTokenBufferMemory",
+    on_token: Optional[Callable[[str], None]] = None
+) -> Tuple[str, bool]:
+    """Borrow an agent from the pool and ask it the query, with the conversation's memory.
+    
+    Returns the answer and whether it succeeded.
+    """
+    pool = await get_agent_pool()
+    agent = await pool.get()
+    try:
+        executor = agent.agent_executor.model_copy(update={"memory": memory})
+        
+        # Searches and LLM calls are awaited, so other requests keep running meanwhile;
+        # the endpoints cache per conversation themselves, so skip the agent's cache
+        ai_response = await agent.aask_question(query.query, on_token, no_cache=True, executor=executor)
+        return ai_response, agent.last_error is None
+    finally:
+        pool.put_nowait(agent)
+
+def build_search_response(query: SearchQuery, ai_response: str) -> SearchResponse:
+    """Wrap the agent's answer with its sources and search results."""
+    # Extract sources from the response
+    sources = extract_sources_from_response(ai_response)
+    
+    # Create mock search results (in a full implementation, you'd extract actual search results)
+    search_results = create_mock_search_results(query.query, ai_response)
+    
+    return SearchResponse.model_construct(
+        query=query.query,
+        results=search_results,
+        ai_summary=ai_response,
+        sources=sources,
+        conversation_id=query.conversation_id,
+        timestamp=datetime.now(timezone.utc)
+    )
+
+def build_error_response(query: SearchQuery, error: Exception) -> SearchResponse:
+    """Fallback response used when the search pipeline fails."""
+    return SearchResponse.model_construct(
+        query=query.query,
+        results=[SearchResult.model_construct(
+            title="Search Error",
+            url="https://error.com",
+            snippet=f"Unable to perform web search: {str(error)}",
+            domain="error.com"
+        )],
+        ai_summary=f"I apologize, but I encountered an error while searching for information about '{query.query}'. Please make sure the OpenAI API key is configured correctly. Error: {str(error)}",
+        sources=["error"],
+        conversation_id=query.conversation_id or str(uuid.uuid4()),
+        timestamp=datetime.now(timezone.utc)
+    )
+
+# Set MOCK_SEARCH=1 to answer searches with canned data, e.g. for frontend work without API keys
+MOCK_SEARCH = os.getenv("MOCK_SEARCH") == "1"
+
+MOCK_RESPONSE = SearchResponse.model_construct(
+    query="",
+    results=[SearchResult.model_construct(
+        title="Mock Search Result",
+        url="https://example.com",
+        snippet="Mock search results are enabled (MOCK_SEARCH=1); no web search was performed.",
+        domain="example.com"
+    )],
+    ai_summary="This is a mock answer. Unset MOCK_SEARCH to run the web search agent.",
+    sources=["example.com"],
+    conversation_id="",
+    timestamp=datetime.now(timezone.utc)
+)
+
+def search_json(response: SearchResponse) -> UTCJSONResponse:
+    """Serialize a SearchResponse straight to JSON, skipping response_model re-validation."""
+    return UTCJSONResponse(response.model_dump())
+
+def build_mock_response(query: SearchQuery) -> SearchResponse:
+    """Return the canned mock response for the given query."""
+    return MOCK_RESPONSE.model_copy(update={
+        "query": query.query,
+        "conversation_id": query.conversation_id or str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc)
+    })
+
 @app.post("/search", response_model=SearchResponse)
 async def search(query: SearchQuery):
     """
     Main search endpoint that combines web search with AI-powered summarization
     """
+    query = with_conversation_id(query)
+    if MOCK_SEARCH:
+        return search_json(build_mock_response(query))
+    
     try:
-        # Get the web search agent
-        agent = get_web_agent()
+        memory = await get_conversation_memory(query.conversation_id)
         
-        # Perform the actual web search and get AI response
-        ai_response = agent.ask_question(query.query)
+        # Serve repeated and near-duplicate first questions from the cache
+        cacheable = starts_conversation(memory)
+        if cacheable:
+            cached, embedding = await find_cached_response(query)
+            if cached is not None:
+                remember_cached_answer(memory, query, cached)
+                return search_json(cached)
         
-        # Extract sources from the response
-        sources = extract_sources_from_response(ai_response)
+        ai_response, succeeded = await ask_agent(query, memory)
+        response = build_search_response(query, ai_response)
         
-        # Create mock search results (in a full implementation, you'd extract actual search results)
-        search_results = create_mock_search_results(query.query, ai_response)
+        # Don't cache answers produced from an agent error
+        if cacheable and succeeded:
+            cache_response(query, embedding, response)
         
-        return SearchResponse(
-            query=query.query,
-            results=search_results,
-            ai_summary=ai_response,
-            sources=sources,
-            conversation_id=query.conversation_id or str(uuid.uuid4()),
-            timestamp=datetime.now()
-        )
+        return search_json(response)
         
     except Exception as e:
         # Fallback to basic response if agent fails
-        return SearchResponse(
-            query=query.query,
-            results=[SearchResult(
-                title="Search Error",
-                url="https://error.com",
-                snippet=f"Unable to perform web search: {str(e)}",
-                domain="error.com"
-            )],
-            ai_summary=f"I apologize, but I encountered an error while searching for information about '{query.query}'. Please make sure the OpenAI API key is configured correctly. Error: {str(e)}",
-            sources=["error"],
-            conversation_id=query.conversation_id or str(uuid.uuid4()),
-            timestamp=datetime.now()
-        )
+        return search_json(build_error_response(query, e))
+
+def sse_event(event: str, data: str) -> str:
+    """Format a single Server-Sent Event."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+@app.post("/search/stream")
+async def search_stream(query: SearchQuery):
+    """
+    Streaming variant of /search: sends the answer token by token as Server-Sent
+    Events, followed by a final `result` event carrying the full SearchResponse
+    """
+    query = with_conversation_id(query)
+    
+    async def event_stream():
+        if MOCK_SEARCH:
+            yield sse_event("result", build_mock_response(query).model_dump_json())
+            return
+        
+        try:
+            memory = await get_conversation_memory(query.conversation_id)
+            cacheable = starts_conversation(memory)
+            if cacheable:
+                cached, embedding = await find_cached_response(query)
+                if cached is not None:
+                    remember_cached_answer(memory, query, cached)
+                    yield sse_event("result", cached.model_dump_json())
+                    return
+            
+            # Tokens are produced by the agent's callbacks, which run inline on this event loop
+            tokens: asyncio.Queue = asyncio.Queue()
+            agent_task = asyncio.create_task(ask_agent(query, memory, tokens.put_nowait))
+            
+            while True:
+                token_task = asyncio.ensure_future(tokens.get())
+                done, _ = await asyncio.wait({token_task, agent_task}, return_when=asyncio.FIRST_COMPLETED)
+                if token_task in done:
+                    yield sse_event("token", json.dumps({"content": token_task.result()}))
+                    continue
+                token_task.cancel()
+                break
+            
+            # Flush tokens that arrived alongside the final answer
+            while not tokens.empty():
+                yield sse_event("token", json.dumps({"content": tokens.get_nowait()}))
+            
+            ai_response, succeeded = agent_task.result()
+            response = build_search_response(query, ai_response)
+            if cacheable and succeeded:
+                cache_response(query, embedding, response)
+            
+            yield sse_event("result", response.model_dump_json())
+            
+        except Exception as e:
+            yield sse_event("result", build_error_response(query, e).model_dump_json())
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 @app.get("/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
     """
     Retrieve conversation history
     """
-    # Mock implementation
-    return {
+    # Mock implementation; returned as a response so the datetime is rendered by orjson, like /search
+    return UTCJSONResponse({
         "conversation_id": conversation_id,
         "messages": [],
-        "created_at": datetime.now()
-    }
+        "created_at": datetime.now(timezone.utc)
+    })
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # One process per core, each with its own agent pool and caches;
+    # "auto" picks uvloop where it is installed (it is not on Windows)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="auto",
+        http="httptools",
+        limit_concurrency=1000,
+        timeout_keep_alive=30
+    ) 
\ No newline at end of file
@@ -15,29 +15,32 @@ Usage:
     python mock_events_script.py [--sessions=10] [--days=7] [--agents=3]
 
 This script helps you test your Amplitude dashboards with realistic agent interaction data.
+Events are buffered and sent in batches over a single aiohttp session.
+
+The API key is read from AMPLITUDE_API_KEY. If it is unset, or AMPLI_DISABLED=1, no
+requests are made and events are only recorded in memory.
 """
 
 import argparse
-import random
+import asyncio
+import os
 import time
-import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 import json
 
-# Import the Ampli SDK (already configured in the project)
-from ampli import ampli, LoadOptions, Environment
-from ampli.ampli import (
-    AgentRunStarted,
-    AgentRunCompleted,
-    AgentToolCalled,
-    AgentMessage,
-    LoadClientOptions,
-    UserMessage,
-)
+import aiohttp
+import numpy as np
+
+# Events are posted straight to Amplitude's HTTP V2 batch endpoint
+AMPLITUDE_BATCH_URL = "https://api2.amplitude.com/batch"
+
+# Random bytes drawn per refill of the ID pool (two hex characters per byte)
+ID_POOL_BYTES = 64 * 1024
 
-# Configuration - Ampli is already configured with the API key
-# API Key: dd9b69458da7276206d45eafd58f4174 (configured in ampli setup)
+# Buffered events are sent once this many accumulate, or when the interval elapses
+FLUSH_QUEUE_SIZE = 500
+FLUSH_INTERVAL_SECONDS = 10.0
 
 
 # Mock data constants
@@ -52,6 +55,16 @@ MODEL_NAMES = [
     "gemini-1.5-flash",
 ]
 
+# Simplified cost per token, aligned with MODEL_NAMES
+COST_PER_TOKEN = np.array([
+    0.00001,   # gpt-4o
+    0.000001,  # gpt-4o-mini
+    0.000005,  # claude-3-5-sonnet-20241022
+    0.000002,  # claude-3-5-haiku-20241022
+    0.000003,  # gemini-1.5-pro
+    0.000001,  # gemini-1.5-flash
+])
+
 TOOL_NAMES = [
     "codebase_search",
     "read_file",
@@ -89,12 +102,40 @@ ORG_IDS = ["org_123", "org_456", "org_789"]
 APP_IDS = ["langley-prod", "langley-dev", "langley-staging"]
 
 
+def format_timestamp(timestamp_ms: int) -> str:
+    """Format an epoch-milliseconds timestamp as an ISO 8601 UTC string."""
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).isoformat()
+
+
 class MockEventGenerator:
     """Generates realistic mock agent analytics events."""
 
-    def __init__(self):
+    def __init__(self, http: Optional[aiohttp.ClientSession], api_key: str, disabled: bool = False):
         self.user_counter = 1
         self.session_counter = 1
+        self.http = http
+        self.api_key = api_key
+        self.disabled = disabled
+        self.pending_events: List[Dict[str, Any]] = []
+        self.recorded_events: List[Dict[str, Any]] = []
+        self.failed_events = 0
+        self.last_flush = time.monotonic()
+        self.rng = np.random.default_rng()
+        self.id_pool = ""
+        self.id_pool_pos = 0
+
+    def random_hex(self, length: int) -> str:
+        """Take the next `length` random hex characters from the pre-generated pool."""
+        if self.id_pool_pos + length > len(self.id_pool):
+            self.id_pool = self.rng.bytes(ID_POOL_BYTES).hex()
+            self.id_pool_pos = 0
+        start = self.id_pool_pos
+        self.id_pool_pos += length
+        return self.id_pool[start:self.id_pool_pos]
+
+    def pick(self, choices: List[Any], size: int) -> List[Any]:
+        """Pick `size` items uniformly at random, with replacement."""
+        return [choices[i] for i in self.rng.integers(0, len(choices), size=size).tolist()]
 
     def generate_user_id(self) -> str:
         """Generate a mock user ID."""
@@ -110,197 +151,230 @@ class MockEventGenerator:
 
     def generate_run_id(self) -> str:
         """Generate a unique run ID."""
-        return f"run_{uuid.uuid4().hex[:8]}"
+        return f"run_{self.random_hex(8)}"
 
     def generate_message_id(self) -> str:
         """Generate a unique message ID."""
-        return f"msg_{uuid.uuid4().hex[:8]}"
+        return f"msg_{self.random_hex(8)}"
 
     def generate_device_id(self) -> str:
         """Generate a mock device ID."""
-        return f"device_{uuid.uuid4().hex[:12]}"
+        return f"device_{self.random_hex(12)}"
 
     def generate_prompt_hash(self) -> str:
         """Generate a mock prompt hash."""
-        return f"prompt_{uuid.uuid4().hex[:16]}"
-
-    def calculate_cost(self, model_name: str, input_tokens: int, output_tokens: int) -> float:
-        """Calculate mock cost based on model and tokens."""
-        # Simplified cost calculation based on common pricing
-        cost_per_token = {
-            "gpt-4o": 0.00001,
-            "gpt-4o-mini": 0.000001,
-            "claude-3-5-sonnet-20241022": 0.000005,
-            "claude-3-5-haiku-20241022": 0.000002,
-            "gemini-1.5-pro": 0.000003,
-            "gemini-1.5-flash": 0.000001,
+        return f"prompt_{self.random_hex(16)}"
+
+    def calculate_costs(self, model_index: int, input_tokens: np.ndarray, output_tokens: np.ndarray) -> List[float]:
+        """Calculate mock costs for a batch of messages from the same model."""
+        return np.round((input_tokens + output_tokens) * COST_PER_TOKEN[model_index], 6).tolist()
+
+    async def send_event(
+        self,
+        event_type: str,
+        user_id: str,
+        device_id: str,
+        timestamp_ms: int,
+        properties: Dict[str, Any],
+        groups: Dict[str, str],
+    ) -> None:
+        """Buffer an event, flushing once the batch is full or the flush interval has passed.
+
+        When disabled, the event is only recorded in memory. The mock time is sent as the
+        `timestamp` property; Amplitude's own event time is left to be the ingestion time.
+        """
+        properties["timestamp"] = format_timestamp(timestamp_ms)
+        event = {
+            "event_type": event_type,
+            "user_id": user_id,
+            "device_id": device_id,
+            "event_properties": properties,
+            "groups": groups,
         }
-
-        rate = cost_per_token.get(model_name, 0.000003)
-        return round((input_tokens + output_tokens) * rate, 6)
-
-    def emit_agent_run_started(self, run_data: Dict[str, Any]) -> None:
-        """Emit agent run started event using Ampli SDK."""
-        event = AgentRunStarted(
-            agent_id=run_data["agent_id"],
-            agent_run_id=run_data["run_id"],
-            app_id=run_data["app_id"],
-            device_id=run_data["device_id"],
-            model_name=run_data["model_name"],
-            org_id=run_data["org_id"],
-            prompt_hash=run_data["prompt_hash"],
-            session_id=run_data["session_id"],
-            temperature=str(run_data["temperature"]),
-            timestamp=run_data["start_time"].isoformat(),
-        )
-
-        ampli.agent_run_started(
+        if self.disabled:
+            self.recorded_events.append(event)
+            return
+
+        self.pending_events.append(event)
+        if (
+            len(self.pending_events) >= FLUSH_QUEUE_SIZE
+            or time.monotonic() - self.last_flush >= FLUSH_INTERVAL_SECONDS
+        ):
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Send all buffered events to Amplitude in a single request.
+
+        A failed request is reported and its events are counted in `failed_events`, rather than
+        raised into whichever session happened to trigger the flush.
+        """
+        events, self.pending_events = self.pending_events, []
+        self.last_flush = time.monotonic()
+        if not events:
+            return
+
+        payload = {"api_key": self.api_key, "events": events}
+        try:
+            async with self.http.post(AMPLITUDE_BATCH_URL, json=payload) as response:
+                response.raise_for_status()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.failed_events += len(events)
+            print(f"❌ Failed to flush {len(events)} events to Amplitude: {e}")
+            return
+        print(f"📤 Flushed {len(events)} events to Amplitude")
+
+    async def emit_agent_run_started(self, run_data: Dict[str, Any]) -> None:
+        """Emit agent run started event."""
+        await self.send_event(
+            "agent run started",
             run_data["user_id"],
-            event,
+            run_data["device_id"],
+            run_data["start_time"],
             {
-                "groups": {
-                    "org id": run_data["org_id"],
-                    "app id": run_data["app_id"],
-                }
+                "agent_id": run_data["agent_id"],
+                "agent_run_id": run_data["run_id"],
+                "app_id": run_data["app_id"],
+                "device_id": run_data["device_id"],
+                "model_name": run_data["model_name"],
+                "org_id": run_data["org_id"],
+                "prompt_hash": run_data["prompt_hash"],
+                "session_id": run_data["session_id"],
+                "temperature": str(run_data["temperature"]),
+            },
+            {
+                "org id": run_data["org_id"],
+                "app id": run_data["app_id"],
             },
         )
         print(f"✅ Emitted: agent run started (run_id: {run_data['run_id']})")
 
-    def emit_agent_run_completed(self, run_data: Dict[str, Any]) -> None:
-        """Emit agent run completed event using Ampli SDK."""
-        event = AgentRunCompleted(
-            agent_run_id=run_data["run_id"],
-            app_id=run_data["app_id"],
-            completion_quality_score=str(run_data["quality_score"]),
-            device_id=run_data["device_id"],
-            org_id=run_data["org_id"],
-            p_95_ttfb_ms=str(run_data["p95_ttfb_ms"]),
-            session_id=run_data["session_id"],
-            timestamp=run_data["end_time"].isoformat(),
-            total_cost_usd=str(run_data["total_cost"]),
-            total_tokens=str(run_data["total_tokens"]),
-        )
-
-        ampli.agent_run_completed(
+    async def emit_agent_run_completed(self, run_data: Dict[str, Any]) -> None:
+        """Emit agent run completed event."""
+        await self.send_event(
+            "agent run completed",
             run_data["user_id"],
-            event,
+            run_data["device_id"],
+            run_data["end_time"],
             {
-                "groups": {
-                    "org id": run_data["org_id"],
-                    "app id": run_data["app_id"],
-                }
+                "agent_run_id": run_data["run_id"],
+                "app_id": run_data["app_id"],
+                "completion_quality_score": str(run_data["quality_score"]),
+                "device_id": run_data["device_id"],
+                "org_id": run_data["org_id"],
+                "p_95_ttfb_ms": str(run_data["p95_ttfb_ms"]),
+                "session_id": run_data["session_id"],
+                "total_cost_usd": str(run_data["total_cost"]),
+                "total_tokens": str(run_data["total_tokens"]),
+            },
+            {
+                "org id": run_data["org_id"],
+                "app id": run_data["app_id"],
             },
         )
         print(f"✅ Emitted: agent run completed (run_id: {run_data['run_id']}, cost: ${run_data['total_cost']:.4f})")
 
-    def emit_agent_tool_called(self, tool_data: Dict[str, Any]) -> None:
-        """Emit agent tool called event using Ampli SDK."""
-        event = AgentToolCalled(
-            agent_run_id=tool_data["run_id"],
-            app_id=tool_data["app_id"],
-            device_id=tool_data["device_id"],
-            latency_ms=str(tool_data["latency_ms"]),
-            org_id=tool_data["org_id"],
-            session_id=tool_data["session_id"],
-            timestamp=tool_data["timestamp"].isoformat(),
-            tokens=str(tool_data["tokens"]),
-            tool_name=tool_data["tool_name"],
-            tool_success=str(tool_data["success"]).lower(),
-        )
-
-        ampli.agent_tool_called(
+    async def emit_agent_tool_called(self, tool_data: Dict[str, Any]) -> None:
+        """Emit agent tool called event."""
+        await self.send_event(
+            "agent tool called",
             tool_data["user_id"],
-            event,
+            tool_data["device_id"],
+            tool_data["timestamp"],
             {
-                "groups": {
-                    "org id": tool_data["org_id"],
-                    "app id": tool_data["app_id"],
-                }
+                "agent_run_id": tool_data["run_id"],
+                "app_id": tool_data["app_id"],
+                "device_id": tool_data["device_id"],
+                "latency_ms": str(tool_data["latency_ms"]),
+                "org_id": tool_data["org_id"],
+                "session_id": tool_data["session_id"],
+                "tokens": str(tool_data["tokens"]),
+                "tool_name": tool_data["tool_name"],
+                "tool_success": str(tool_data["success"]).lower(),
+            },
+            {
+                "org id": tool_data["org_id"],
+                "app id": tool_data["app_id"],
             },
         )
         print(f"✅ Emitted: agent tool called (tool: {tool_data['tool_name']}, success: {tool_data['success']})")
 
-    def emit_agent_message(self, message_data: Dict[str, Any]) -> None:
-        """Emit agent message event using Ampli SDK."""
-        event = AgentMessage(
-            agent_run_id=message_data["run_id"],
-            app_id=message_data["app_id"],
-            cost_usd=str(message_data["cost"]),
-            device_id=message_data["device_id"],
-            input_tokens=str(message_data["input_tokens"]),
-            latency_ms=str(message_data["latency_ms"]),
-            message_content=message_data["content"],
-            message_id=message_data["message_id"],
-            model_name=message_data["model_name"],
-            org_id=message_data["org_id"],
-            output_tokens=str(message_data["output_tokens"]),
-            session_id=message_data["session_id"],
-            temperature=str(message_data["temperature"]),
-            timestamp=message_data["timestamp"].isoformat(),
-        )
-
-        ampli.agent_message(
+    async def emit_agent_message(self, message_data: Dict[str, Any]) -> None:
+        """Emit agent message event."""
+        await self.send_event(
+            "agent message",
             message_data["user_id"],
-            event,
+            message_data["device_id"],
+            message_data["timestamp"],
             {
-                "groups": {
-                    "org id": message_data["org_id"],
-                    "app id": message_data["app_id"],
-                }
+                "agent_run_id": message_data["run_id"],
+                "app_id": message_data["app_id"],
+                "cost_usd": str(message_data["cost"]),
+                "device_id": message_data["device_id"],
+                "input_tokens": str(message_data["input_tokens"]),
+                "latency_ms": str(message_data["latency_ms"]),
+                "message_content": message_data["content"],
+                "message_id": message_data["message_id"],
+                "model_name": message_data["model_name"],
+                "org_id": message_data["org_id"],
+                "output_tokens": str(message_data["output_tokens"]),
+                "session_id": message_data["session_id"],
+                "temperature": str(message_data["temperature"]),
+            },
+            {
+                "org id": message_data["org_id"],
+                "app id": message_data["app_id"],
             },
         )
         print(
             f"✅ Emitted: agent message (tokens: {message_data['input_tokens']}+{message_data['output_tokens']}, cost: ${message_data['cost']:.4f})"
         )
 
-    def emit_user_message(self, message_data: Dict[str, Any]) -> None:
-        """Emit user message event using Ampli SDK."""
-        event = UserMessage(
-            agent_run_id=message_data["run_id"],
-            app_id=message_data["app_id"],
-            device_id=message_data["device_id"],
-            message_content=message_data["content"],
-            message_id=message_data["message_id"],
-            org_id=message_data["org_id"],
-            session_id=message_data["session_id"],
-            timestamp=message_data["timestamp"].isoformat(),
-        )
-
-        ampli.user_message(
+    async def emit_user_message(self, message_data: Dict[str, Any]) -> None:
+        """Emit user message event."""
+        await self.send_event(
+            "user message",
             message_data["user_id"],
-            event,
+            message_data["device_id"],
+            message_data["timestamp"],
             {
-                "groups": {
-                    "org id": message_data["org_id"],
-                    "app id": message_data["app_id"],
-                }
+                "agent_run_id": message_data["run_id"],
+                "app_id": message_data["app_id"],
+                "device_id": message_data["device_id"],
+                "message_content": message_data["content"],
+                "message_id": message_data["message_id"],
+                "org_id": message_data["org_id"],
+                "session_id": message_data["session_id"],
+            },
+            {
+                "org id": message_data["org_id"],
+                "app id": message_data["app_id"],
             },
         )
         print(f"✅ Emitted: user message (content: {message_data['content'][:50]}...)")
 
-    def generate_mock_session(self, base_time: datetime) -> None:
-        """Generate a complete mock agent session with all events."""
+    async def generate_mock_session(self, base_time: float) -> None:
+        """Generate a complete mock agent session with all events, starting from epoch seconds `base_time`."""
+        rng = self.rng
 
         # Generate session identifiers
         user_id = self.generate_user_id()
         session_id = self.generate_session_id()
         run_id = self.generate_run_id()
         device_id = self.generate_device_id()
-        agent_id = random.choice(AGENT_TYPES)
-        model_name = random.choice(MODEL_NAMES)
-        org_id = random.choice(ORG_IDS)
-        app_id = random.choice(APP_IDS)
+        agent_id, = self.pick(AGENT_TYPES, 1)
+        model_index = int(rng.integers(0, len(MODEL_NAMES)))
+        model_name = MODEL_NAMES[model_index]
+        org_id, = self.pick(ORG_IDS, 1)
+        app_id, = self.pick(APP_IDS, 1)
 
         # Session timing
-        start_time = base_time + timedelta(
-            hours=random.randint(0, 23), minutes=random.randint(0, 59), seconds=random.randint(0, 59)
-        )
+        start_time = int(base_time * 1000) + int(rng.integers(0, 86400)) * 1000
 
         # Session parameters
-        temperature = round(random.uniform(0.0, 1.0), 1)
+        temperature = round(float(rng.uniform(0.0, 1.0)), 1)
         prompt_hash = self.generate_prompt_hash()
 
-        # Initialize session tracking
+        # Initialize session tracking; times are epoch milliseconds
         total_cost = 0.0
         total_tokens = 0
         current_time = start_time
@@ -323,113 +397,165 @@ class MockEventGenerator:
         print(f"\n🚀 Starting mock session: {run_id} (agent: {agent_id}, model: {model_name})")
 
         # 1. Emit agent run started
-        self.emit_agent_run_started(session_data)
-        current_time += timedelta(seconds=random.randint(1, 5))
-
-        # 2. Generate conversation messages
-        num_exchanges = random.randint(2, 8)
-
-        for exchange in range(num_exchanges):
-            # User message
-            user_message_id = self.generate_message_id()
-            user_content = random.choice(USER_MESSAGES)
-
-            user_msg_data = {
-                "user_id": user_id,
-                "run_id": run_id,
-                "device_id": device_id,
-                "app_id": app_id,
-                "org_id": org_id,
-                "session_id": session_id,
-                "message_id": user_message_id,
-                "content": user_content,
-                "timestamp": current_time,
-            }
-
-            self.emit_user_message(user_msg_data)
-            current_time += timedelta(seconds=random.randint(1, 3))
-
-            # Agent processing time
-            processing_time = random.randint(500, 3000)
-
-            # Generate tool calls (0-3 per agent response)
-            num_tools = random.randint(0, 3)
-            for tool_idx in range(num_tools):
-                tool_name = random.choice(TOOL_NAMES)
-                tool_success = random.choice([True, True, True, False])  # 75% success rate
-                tool_latency = random.randint(100, 2000)
-                tool_tokens = random.randint(50, 500)
-
-                tool_data = {
+        await self.emit_agent_run_started(session_data)
+        current_time += int(rng.integers(1, 6)) * 1000
+
+        # 2. Generate conversation messages, drawing every random value up front
+        num_exchanges = int(rng.integers(2, 9))
+        user_contents = self.pick(USER_MESSAGES, num_exchanges)
+        user_pauses = (rng.integers(1, 4, size=num_exchanges) * 1000).tolist()
+        processing_times = rng.integers(500, 3001, size=num_exchanges).tolist()
+        tool_counts = rng.integers(0, 4, size=num_exchanges).tolist()  # 0-3 tools per agent response
+        agent_contents = self.pick(AGENT_MESSAGES, num_exchanges)
+        input_token_counts = rng.integers(200, 1501, size=num_exchanges)
+        output_token_counts = rng.integers(150, 801, size=num_exchanges)
+        message_costs = self.calculate_costs(model_index, input_token_counts, output_token_counts)
+        input_token_counts = input_token_counts.tolist()
+        output_token_counts = output_token_counts.tolist()
+        exchange_pauses = (rng.integers(2, 11, size=num_exchanges) * 1000).tolist()
+
+        num_tool_calls = sum(tool_counts)
+        tool_names = self.pick(TOOL_NAMES, num_tool_calls)
+        tool_successes = (rng.random(num_tool_calls) < 0.75).tolist()  # 75% success rate
+        tool_latencies = rng.integers(100, 2001, size=num_tool_calls).tolist()
+        tool_token_counts = rng.integers(50, 501, size=num_tool_calls).tolist()
+        tool_call = 0
+
+        # Exchange events are independent, so send them concurrently
+        async with asyncio.TaskGroup() as tg:
+            for exchange in range(num_exchanges):
+                # User message
+                user_msg_data = {
                     "user_id": user_id,
                     "run_id": run_id,
                     "device_id": device_id,
                     "app_id": app_id,
                     "org_id": org_id,
                     "session_id": session_id,
-                    "tool_name": tool_name,
-                    "success": tool_success,
-                    "latency_ms": tool_latency,
-                    "tokens": tool_tokens,
+                    "message_id": self.generate_message_id(),
+                    "content": user_contents[exchange],
                     "timestamp": current_time,
                 }
 
-                self.emit_agent_tool_called(tool_data)
-                current_time += timedelta(milliseconds=tool_latency)
-                total_tokens += tool_tokens
-
-            # Agent message
-            agent_message_id = self.generate_message_id()
-            agent_content = random.choice(AGENT_MESSAGES)
-            input_tokens = random.randint(200, 1500)
-            output_tokens = random.randint(150, 800)
-            message_cost = self.calculate_cost(model_name, input_tokens, output_tokens)
-
-            agent_msg_data = {
-                "user_id": user_id,
-                "run_id": run_id,
-                "device_id": device_id,
-                "app_id": app_id,
-                "org_id": org_id,
-                "session_id": session_id,
-                "message_id": agent_message_id,
-                "content": agent_content,
-                "model_name": model_name,
-                "temperature": temperature,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "cost": message_cost,
-                "latency_ms": processing_time,
-                "timestamp": current_time,
-            }
-
-            self.emit_agent_message(agent_msg_data)
-            current_time += timedelta(milliseconds=processing_time)
-            total_cost += message_cost
-            total_tokens += input_tokens + output_tokens
-
-            # Brief pause between exchanges
-            current_time += timedelta(seconds=random.randint(2, 10))
+                tg.create_task(self.emit_user_message(user_msg_data))
+                current_time += user_pauses[exchange]
+
+                # Agent processing time
+                processing_time = processing_times[exchange]
+
+                # Tool calls
+                for _ in range(tool_counts[exchange]):
+                    tool_latency = tool_latencies[tool_call]
+                    tool_tokens = tool_token_counts[tool_call]
+
+                    tool_data = {
+                        "user_id": user_id,
+                        "run_id": run_id,
+                        "device_id": device_id,
+                        "app_id": app_id,
+                        "org_id": org_id,
+                        "session_id": session_id,
+                        "tool_name": tool_names[tool_call],
+                        "success": tool_successes[tool_call],
+                        "latency_ms": tool_latency,
+                        "tokens": tool_tokens,
+                        "timestamp": current_time,
+                    }
+
+                    tg.create_task(self.emit_agent_tool_called(tool_data))
+                    current_time += tool_latency
+                    total_tokens += tool_tokens
+                    tool_call += 1
+
+                # Agent message
+                input_tokens = input_token_counts[exchange]
+                output_tokens = output_token_counts[exchange]
+                message_cost = message_costs[exchange]
+
+                agent_msg_data = {
+                    "user_id": user_id,
+                    "run_id": run_id,
+                    "device_id": device_id,
+                    "app_id": app_id,
+                    "org_id": org_id,
+                    "session_id": session_id,
+                    "message_id": self.generate_message_id(),
+                    "content": agent_contents[exchange],
+                    "model_name": model_name,
+                    "temperature": temperature,
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "cost": message_cost,
+                    "latency_ms": processing_time,
+                    "timestamp": current_time,
+                }
+
+                tg.create_task(self.emit_agent_message(agent_msg_data))
+                current_time += processing_time
+                total_cost += message_cost
+                total_tokens += input_tokens + output_tokens
+
+                # Brief pause between exchanges
+                current_time += exchange_pauses[exchange]
 
         # 3. Emit agent run completed
         end_time = current_time
-        session_duration = (end_time - start_time).total_seconds()
+        session_duration = (end_time - start_time) / 1000
 
         completion_data = {
             **session_data,
             "end_time": end_time,
             "total_cost": total_cost,
             "total_tokens": total_tokens,
-            "quality_score": round(random.uniform(0.7, 1.0), 2),
-            "p95_ttfb_ms": random.randint(200, 1500),
+            "quality_score": round(float(rng.uniform(0.7, 1.0)), 2),
+            "p95_ttfb_ms": int(rng.integers(200, 1501)),
         }
 
-        self.emit_agent_run_completed(completion_data)
+        await self.emit_agent_run_completed(completion_data)
 
         print(f"✅ Session completed: {session_duration:.1f}s, {total_tokens} tokens, ${total_cost:.4f}")
 
-        # Small delay between sessions
-        time.sleep(0.1)
+
+async def run_sessions(generator: MockEventGenerator, args: argparse.Namespace) -> None:
+    """Generate all mock sessions concurrently, spread across the last `args.days` days."""
+    # Generate sessions across the specified time range, in epoch seconds
+    end_time = time.time()
+    start_time = end_time - args.days * 86400
+
+    async def run_session(session_num: int) -> None:
+        # Distribute sessions across the time range
+        progress = session_num / args.sessions
+        session_time = start_time + progress * (end_time - start_time)
+
+        print(f"\n📅 Session {session_num + 1}/{args.sessions} - {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(session_time))}")
+
+        try:
+            await generator.generate_mock_session(session_time)
+        except Exception as e:
+            print(f"❌ Error generating session {session_num + 1}: {e}")
+
+    await asyncio.gather(*(run_session(session_num) for session_num in range(args.sessions)))
+
+
+async def generate_sessions(args: argparse.Namespace, api_key: str, disabled: bool = False) -> MockEventGenerator:
+    """Generate all mock sessions, sending them over a single HTTP session unless disabled."""
+    if disabled:
+        generator = MockEventGenerator(None, api_key, disabled=True)
+        await run_sessions(generator, args)
+        print(f"\n🔕 Amplitude disabled; recorded {len(generator.recorded_events)} events in memory")
+        return generator
+
+    connector = aiohttp.TCPConnector(limit=50)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as http:
+        generator = MockEventGenerator(http, api_key)
+        await run_sessions(generator, args)
+
+        # Flush all remaining events to Amplitude
+        print("\n🚀 Flushing events to Amplitude...")
+        await generator.flush()
+        if generator.failed_events:
+            print(f"⚠️  {generator.failed_events} events could not be sent to Amplitude")
+    return generator
 
 
 def main():
@@ -445,50 +571,14 @@ def main():
     print("=" * 50)
     print(f"📊 Generating {args.sessions} sessions across {args.days} days")
     print(f"🤖 Using {args.agents} different agent types")
-    print(f"🔑 Using Ampli SDK with API Key: dd9b69458da7276206d45eafd58f4174")
     print()
 
-    # Initialize Ampli
-    print("🔧 Initializing Ampli SDK...")
-    try:
-        AMPLITUDE_API_KEY = "dd9b69458da7276206d45eafd58f4174"
-        ampli.load(
-            LoadOptions(
-                client=LoadClientOptions(
-                    api_key=AMPLITUDE_API_KEY,
-                ),
-                disabled=False,
-                environment=Environment.DEVELOPMENT,
-            )
-        )
-        print("✅ Ampli SDK initialized successfully")
-    except Exception as e:
-        print(f"❌ Failed to initialize Ampli SDK: {e}")
-        print("💡 Make sure Ampli is properly configured in your project")
-        return
-
-    generator = MockEventGenerator()
-
-    # Generate sessions across the specified time range
-    end_time = datetime.now()
-    start_time = end_time - timedelta(days=args.days)
-
-    for session_num in range(args.sessions):
-        # Distribute sessions across the time range
-        progress = session_num / args.sessions
-        session_time = start_time + timedelta(seconds=progress * (end_time - start_time).total_seconds())
-
-        print(f"\n📅 Session {session_num + 1}/{args.sessions} - {session_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-        try:
-            generator.generate_mock_session(session_time)
-        except Exception as e:
-            print(f"❌ Error generating session {session_num + 1}: {e}")
-            continue
+    api_key = os.environ.get("AMPLITUDE_API_KEY", "")
+    disabled = os.environ.get("AMPLI_DISABLED", "0") == "1" or not api_key
+    if disabled:
+        print("🔕 AMPLITUDE_API_KEY is not set or AMPLI_DISABLED=1; events will not be sent")
 
-    # Flush all events to Amplitude
-    print("\n🚀 Flushing events to Amplitude...")
-    ampli.flush()
+    asyncio.run(generate_sessions(args, api_key, disabled))
 
     print("\n" + "=" * 50)
     print("✅ Mock data generation completed!")
@@ -0,0 +1,235 @@
+"""
+Semantic Response Cache
+
+Caches responses keyed by query embeddings so that near-duplicate questions
+("weather in SF" vs "current weather in San Francisco") can be answered
+without running the web search agent again.
+
+SemanticResponseCache keeps everything in memory. PersistentSemanticCache stores
+string responses in SQLite via sqlite-vec, so they survive restarts.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """In-memory cache that matches queries by cosine similarity of their embeddings."""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], Sequence[float]],
+        threshold: float = 0.92,
+        ttl_seconds: float = 3600,
+        max_entries: int = 10_000,
+        embed_batch_fn: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None
+    ):
+        self.embed_fn = embed_fn
+        self.embed_batch_fn = embed_batch_fn
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        # Unit-normalized embeddings in the first `_size` rows of a preallocated matrix that
+        # doubles when full, with per-row metadata in parallel arrays
+        self._lock = threading.Lock()
+        self._size = 0
+        self._embeddings: Optional[np.ndarray] = None
+        self._timestamps = np.empty(0, dtype=np.float64)
+        self._namespace_ids = np.empty(0, dtype=np.int32)
+        self._namespace_index: Dict[str, int] = {}
+        self._values: List[Any] = []
+
+        # Scratch rows reused by every lookup (under the lock) instead of allocating per query
+        self._scores = np.empty(0, dtype=np.float32)
+        self._rejected = np.empty(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed text and L2-normalize it so dot products are cosine similarities."""
+        embedding = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed several texts, in one call when a batch embedder is available; one normalized row per text."""
+        if self.embed_batch_fn is not None:
+            embeddings = np.asarray(self.embed_batch_fn(texts), dtype=np.float32)
+        else:
+            embeddings = np.asarray([self.embed_fn(text) for text in texts], dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.where(norms == 0, 1, norms)
+
+    def lookup(self, embedding: np.ndarray, namespace: str = "") -> Optional[Any]:
+        """Return the cached value most similar to the embedding, if it clears the threshold."""
+        with self._lock:
+            namespace_id = self._namespace_index.get(namespace)
+            if not self._size or namespace_id is None:
+                return None
+
+            n = self._size
+            similarities = np.matmul(self._embeddings[:n], embedding.astype(np.float32, copy=False), out=self._scores[:n])
+
+            # Ignore entries from other namespaces and entries past their TTL
+            rejected = np.not_equal(self._namespace_ids[:n], namespace_id, out=self._rejected[:n])
+            rejected |= self._timestamps[:n] <= time.time() - self.ttl_seconds
+            similarities[rejected] = -np.inf
+
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return self._values[best]
+            return None
+
+    def add(self, embedding: np.ndarray, value: Any, namespace: str = "") -> None:
+        """Store a value under the given embedding."""
+        with self._lock:
+            if self._size >= self.max_entries:
+                self._evict()
+            if self._embeddings is None:
+                self._allocate(embedding.size)
+            elif self._size == len(self._embeddings):
+                self._grow()
+
+            row = self._size
+            self._embeddings[row] = embedding
+            self._timestamps[row] = time.time()
+            self._namespace_ids[row] = self._namespace_index.setdefault(namespace, len(self._namespace_index))
+            self._values.append(value)
+            self._size += 1
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._size = 0
+            self._embeddings = None
+            self._timestamps = np.empty(0, dtype=np.float64)
+            self._namespace_ids = np.empty(0, dtype=np.int32)
+            self._namespace_index = {}
+            self._values = []
+
+    def _allocate(self, dimensions: int, capacity: int = 64) -> None:
+        capacity = min(capacity, self.max_entries)
+        self._embeddings = np.empty((capacity, dimensions), dtype=np.float32)
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._namespace_ids = np.empty(capacity, dtype=np.int32)
+        self._scores = np.empty(capacity, dtype=np.float32)
+        self._rejected = np.empty(capacity, dtype=bool)
+
+    def _grow(self) -> None:
+        """Double the capacity (up to max_entries), keeping the existing rows."""
+        n = self._size
+        embeddings, timestamps, namespace_ids = self._embeddings, self._timestamps, self._namespace_ids
+        self._allocate(embeddings.shape[1], capacity=2 * len(embeddings))
+        self._embeddings[:n] = embeddings[:n]
+        self._timestamps[:n] = timestamps[:n]
+        self._namespace_ids[:n] = namespace_ids[:n]
+
+    def _evict(self) -> None:
+        """Drop expired entries, or the oldest entry if none have expired."""
+        n = self._size
+        keep = np.flatnonzero(self._timestamps[:n] > time.time() - self.ttl_seconds)
+        if len(keep) == n:
+            keep = np.delete(keep, int(np.argmin(self._timestamps[:n])))
+
+        self._size = len(keep)
+        self._embeddings[:self._size] = self._embeddings[keep]
+        self._timestamps[:self._size] = self._timestamps[keep]
+        self._namespace_ids[:self._size] = self._namespace_ids[keep]
+        self._values = [self._values[i] for i in keep]
+
+
+class PersistentSemanticCache(SemanticResponseCache):
+    """SemanticResponseCache backed by a sqlite-vec table on disk; values must be strings."""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], Sequence[float]],
+        path: str = "agent_cache.db",
+        threshold: float = 0.92,
+        ttl_seconds: float = 3600,
+        max_entries: int = 10_000,
+        embed_batch_fn: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None
+    ):
+        super().__init__(embed_fn, threshold, ttl_seconds, max_entries, embed_batch_fn)
+        import sqlite_vec  # Only needed for the on-disk cache
+
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.enable_load_extension(True)
+        sqlite_vec.load(self._db)
+        self._db.enable_load_extension(False)
+
+        # The vector table is created on the first add, once the embedding size is known
+        self._has_table = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'cache'"
+        ).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            if not self._has_table:
+                return 0
+            return self._db.execute("SELECT count(*) FROM cache").fetchone()[0]
+
+    def lookup(self, embedding: np.ndarray, namespace: str = "") -> Optional[str]:
+        """Return the stored response nearest to the embedding, if it clears the threshold."""
+        with self._lock:
+            if not self._has_table:
+                return None
+
+            row = self._db.execute(
+                "SELECT response, distance FROM cache"
+                " WHERE embedding MATCH ? AND k = 1 AND namespace = ? AND ts > ?",
+                (self._to_blob(embedding), namespace, int(time.time() - self.ttl_seconds))
+            ).fetchone()
+
+            # Cosine distance is 1 - cosine similarity
+            if row is not None and 1 - row[1] >= self.threshold:
+                return row[0]
+            return None
+
+    def add(self, embedding: np.ndarray, value: str, namespace: str = "") -> None:
+        """Store a response under the given embedding."""
+        with self._lock:
+            if not self._has_table:
+                self._db.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS cache USING vec0("
+                    f"embedding float[{embedding.size}] distance_metric=cosine, "
+                    f"namespace text, ts integer, +response text)"
+                )
+                self._has_table = True
+            elif self._db.execute("SELECT count(*) FROM cache").fetchone()[0] >= self.max_entries:
+                self._evict()
+
+            self._db.execute(
+                "INSERT INTO cache(embedding, namespace, ts, response) VALUES (?, ?, ?, ?)",
+                (self._to_blob(embedding), namespace, int(time.time()), value)
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            if self._has_table:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._db.close()
+
+    def _evict(self) -> None:
+        """Drop expired entries, or the oldest entry if none have expired."""
+        cursor = self._db.execute("DELETE FROM cache WHERE ts <= ?", (int(time.time() - self.ttl_seconds),))
+        if cursor.rowcount == 0:
+            self._db.execute("DELETE FROM cache WHERE rowid = (SELECT rowid FROM cache ORDER BY ts, rowid LIMIT 1)")
+
+    @staticmethod
+    def _to_blob(embedding: np.ndarray) -> bytes:
+        return np.asarray(embedding, dtype=np.float32).tobytes()
@@ -17,181 +17,547 @@ Usage:
 3. Run the script and ask questions!
 """
 
+import asyncio
+import atexit
+import collections
+import itertools
+import logging
 import os
+import queue
+import re
+import sys
+import threading
 import time
 import uuid
+from concurrent.futures import Future
+from concurrent.futures import wait as wait_for_futures
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
-
-# External dependencies
-import openai
-from langchain.agents import AgentType, initialize_agent, Tool
-from langchain.callbacks.base import BaseCallbackHandler
-from langchain.schema import AgentAction, AgentFinish, LLMResult
-from langchain_openai import ChatOpenAI
-from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
-from functools import wraps
-from langchain.memory import ConversationBufferMemory
-from dotenv import load_dotenv
-
-# Real Amplitude analytics
-import amplitude
-from amplitude import Amplitude, BaseEvent
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Callable, Sequence
+from dataclasses import dataclass, field
+from contextvars import ContextVar
+from functools import lru_cache
+
+# External dependencies; LangChain, OpenAI and Amplitude are slow to import,
+# so they are imported where first used
+import tiktoken
+from langchain_core.callbacks import BaseCallbackHandler
+from cachetools import TTLCache
+import numpy as np
+
+from semantic_cache import PersistentSemanticCache, SemanticResponseCache
+
+if TYPE_CHECKING:
+    import httpx
+    from amplitude import Amplitude
+    from langchain.agents import AgentExecutor, Tool
+    from langchain.memory import ConversationTokenBufferMemory
+    from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+    from duckduckgo_search import DDGS
+    from langchain_core.outputs import LLMResult
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+# Whitespace-delimited words, counted as a rough proxy when no tokenizer is available
+WORD_PATTERN = re.compile(r"\S+")
+
+# Console progress output as plain messages; --quiet raises the level to WARNING, --debug lowers it to DEBUG
+log = logging.getLogger("websearch_agent")
+log.setLevel(logging.INFO)
+log.addHandler(logging.StreamHandler(sys.stdout))
+log.propagate = False
+
+SEPARATOR = "-" * 60
+
+@lru_cache(maxsize=None)
+def get_token_encoder(model_name: str) -> Optional[tiktoken.Encoding]:
+    """Return the tiktoken encoder for a model, or None if it can't be loaded (e.g. offline)."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        log.warning("⚠️  Tokenizer unavailable, estimating tokens from word counts: %s", e)
+        return None
+
+def estimate_tokens(text: str, model_name: str = "gpt-4o-mini") -> int:
+    """Count the tokens in text with the model's tokenizer (about 1.3 tokens per word without one)."""
+    encoder = get_token_encoder(model_name)
+    if encoder is None:
+        return int(sum(1 for _ in WORD_PATTERN.finditer(text)) * 1.3)
+    # encode_ordinary skips the special-token scan; text like "<|endoftext|>" counts as plain text
+    return len(encoder.encode_ordinary(text))
+
+# How many recent answers' latencies a session keeps for its p95
+LATENCY_HISTORY_SIZE = 10_000
+
+def p95(values: Sequence[float]) -> float:
+    """The interpolated 95th percentile of some floats, or 0 when there are none."""
+    if not values:
+        return 0.0
+    return float(np.percentile(np.fromiter(values, dtype=np.float64, count=len(values)), 95))
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and collapse whitespace, for exact-match caching.
+    
+    Only trailing "?", "!" and "." are dropped; other punctuation changes the meaning ("C++" vs "C#").
+    """
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+# Searches used by the question currently being answered; a context variable so that
+# concurrent questions each get their own budget. It holds a one-element list because
+# LangChain runs every tool call in a copy of the context, so the count is updated in place
+search_count: ContextVar[List[int]] = ContextVar("search_count")
+
+# DDGS clients mutate their headers per request, so each thread keeps its own
+ddgs_clients = threading.local()
+
+# Seconds before a stalled DuckDuckGo request gives up, so one slow search can't hold up the answer
+DDG_TIMEOUT_SECONDS = 5
+
+def get_ddgs_client() -> "DDGS":
+    """Return this thread's DuckDuckGo client, so its connections are kept alive between searches."""
+    client = getattr(ddgs_clients, "client", None)
+    if client is None:
+        from duckduckgo_search import DDGS
+        client = ddgs_clients.client = DDGS(timeout=DDG_TIMEOUT_SECONDS)
+    return client
+
+@lru_cache(maxsize=None)
+def get_ddg_search() -> "DuckDuckGoSearchAPIWrapper":
+    """Return the DuckDuckGo search wrapper shared by all agents."""
+    from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+    
+    class PooledDuckDuckGoSearchAPIWrapper(DuckDuckGoSearchAPIWrapper):
+        """Runs text searches on the thread's pooled DDGS client instead of a new one per search."""
+        
+        def _ddgs_text(self, query: str, max_results: Optional[int] = None) -> List[Dict[str, str]]:
+            results = get_ddgs_client().text(
+                query,
+                region=self.region,
+                safesearch=self.safesearch,
+                timelimit=self.time,
+                max_results=max_results or self.max_results,
+                backend=self.backend,
+            )
+            return list(results) if results else []
+    
+    return PooledDuckDuckGoSearchAPIWrapper(max_results=3)  # Limit to 3 results per search
+
+# DuckDuckGo results are shared by all agents and reused for a few minutes
+search_cache = TTLCache(maxsize=512, ttl=300)
+search_cache_lock = threading.Lock()
+
+@lru_cache(maxsize=8)
+def get_llm(
+    openai_api_key: str,
+    model_name: str,
+    temperature: float,
+    http_client: Optional["httpx.Client"] = None,
+    http_async_client: Optional["httpx.AsyncClient"] = None
+) -> "ChatOpenAI":
+    """Return the streaming chat model for these settings, shared by every agent that uses them.
+    
+    `http_client` serves sync calls and `http_async_client` async ones; the SDK's defaults are used when not given.
+    """
+    from langchain_openai import ChatOpenAI
+    
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        openai_api_key=openai_api_key,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        streaming=True
+    )
+
+@lru_cache(maxsize=8)
+def get_embedder(openai_api_key: str, http_client: Optional["httpx.Client"] = None) -> "OpenAIEmbeddings":
+    """Return the question embedder for an API key, shared by every agent that uses it."""
+    from langchain_openai import OpenAIEmbeddings
+    
+    return OpenAIEmbeddings(
+        model="text-embedding-3-small",
+        openai_api_key=openai_api_key,
+        http_client=http_client
+    )
+
+# Instructions for the tool-calling agent; independent searches requested in one step run concurrently
+AGENT_SYSTEM_PROMPT = (
+    "You are a helpful assistant that answers questions with up-to-date information from the web. "
+    "Use the search tool for current events, time-sensitive facts, or anything you are unsure of. "
+    "When a question needs several independent searches, request them together in one step. "
+    "Cite the URLs of the sources you used."
+)
+
+# Queued analytics events are handed to Amplitude in batches of up to this many, or after this long
+ANALYTICS_BATCH_SIZE = 30
+ANALYTICS_BATCH_SECONDS = 0.5
+
+# Queued in place of an event to stop the worker; a flush is queued as a Future instead,
+# which the worker resolves with the Amplitude client's send futures
+STOP_EVENTS = object()
+
+class CircuitBreaker:
+    """Stops calls to a failing service for a cooldown after several consecutive failures."""
+    
+    def __init__(self, name: str, max_failures: int = 3, cooldown_seconds: float = 60):
+        self.name = name
+        self.max_failures = max_failures
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        """Whether calls should be skipped right now."""
+        return time.monotonic() < self._open_until
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures < self.max_failures:
+                return
+            self._failures = 0
+            self._open_until = time.monotonic() + self.cooldown_seconds
+        log.warning("⚠️  %s failed %d times in a row; pausing it for %.0fs", self.name, self.max_failures, self.cooldown_seconds)
+
+# Keep-alive HTTP client the Amplitude SDK posts its batches over, once installed
+amplitude_http: Optional["httpx.Client"] = None
+
+# Shared by every tracker, since they all post to the same endpoint
+amplitude_breaker = CircuitBreaker("Amplitude")
+
+def use_pooled_amplitude_transport() -> None:
+    """Make the Amplitude SDK post event batches over a keep-alive HTTP client.
+    
+    The SDK opens a new connection (and TLS session) with urllib for every batch.
+    The client is shared by every tracker, and is separate from the agents' clients
+    so that it is still open when the last events are sent at exit.
+    """
+    global amplitude_http
+    if amplitude_http is not None:
+        return
+    
+    import io
+    import httpx
+    from amplitude import worker
+    from amplitude.constants import CONNECTION_TIMEOUT
+    from amplitude.http_client import JSON_HEADER, Response
+    
+    amplitude_http = httpx.Client(limits=httpx.Limits(max_keepalive_connections=10))
+    
+    class PooledHttpClient:
+        """Drop-in for amplitude.http_client.HttpClient, with httpx in place of urllib."""
+        
+        @staticmethod
+        def post(url: str, payload: bytes, header=None) -> Response:
+            result = Response()
+            if amplitude_breaker.is_open:
+                result.body = {"error": "Amplitude paused after repeated failures"}
+                return result
+            try:
+                res = amplitude_http.post(url, content=payload, headers=header or JSON_HEADER, timeout=CONNECTION_TIMEOUT)
+                try:
+                    result.parse(io.BytesIO(res.content))
+                except Exception:
+                    result.code = res.status_code
+                    result.status = Response.get_status(res.status_code)
+                    result.body = {"error": res.reason_phrase}
+            except httpx.TimeoutException:
+                result.code = 408
+                result.status = Response.get_status(408)
+            except httpx.HTTPError as e:
+                result.body = {"error": str(e)}
+            
+            if 200 <= result.code < 300:
+                amplitude_breaker.record_success()
+            else:
+                amplitude_breaker.record_failure()
+            return result
+    
+    worker.HttpClient = PooledHttpClient
+
+class AmplitudeEventWorker:
+    """Background thread that hands queued events to an Amplitude client in batches.
+    
+    Each event is queued with the tracker it belongs to, which builds it on the worker thread.
+    """
+    
+    def __init__(self, client: "Amplitude"):
+        self.client = client
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread = threading.Thread(target=self._drain, name="amplitude-events", daemon=True)
+        self._thread.start()
+        
+        # The client shuts down at exit the same way and then drops new events; exit hooks run
+        # in reverse, so registering after the client was created drains the queue before that
+        if hasattr(threading, "_register_atexit"):
+            threading._register_atexit(self.close)
+        else:
+            atexit.register(self.close)
+    
+    def put(self, tracker: "AgentAnalyticsTracker", event_type: str, properties: Dict[str, Any]) -> None:
+        self._queue.put((tracker, event_type, properties))
+    
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Push everything queued so far to Amplitude.
+        
+        Returns right away, or with a `timeout` once the events are sent or the timeout has passed.
+        """
+        flushed: "Future[List[Future]]" = Future()
+        self._queue.put(flushed)
+        if timeout is not None:
+            self._wait(flushed, timeout)
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """Send any queued events and stop the worker; called at exit."""
+        if self._thread.is_alive():
+            flushed: "Future[List[Future]]" = Future()
+            self._queue.put(flushed)
+            self._queue.put(STOP_EVENTS)
+            self._wait(flushed, timeout)
+    
+    @staticmethod
+    def _wait(flushed: "Future[List[Future]]", timeout: float) -> None:
+        """Wait for a queued flush to reach the client, then for its sends to finish."""
+        deadline = time.monotonic() + timeout
+        try:
+            sends = flushed.result(timeout)
+        except TimeoutError:
+            return
+        wait_for_futures([send for send in sends if send is not None], max(0, deadline - time.monotonic()))
+    
+    def _drain(self) -> None:
+        """Worker loop: hand queued events to Amplitude in batches until stopped."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + ANALYTICS_BATCH_SECONDS
+            # A flush or stop ends the wait for a full batch
+            while len(batch) < ANALYTICS_BATCH_SIZE and not isinstance(batch[-1], Future) and batch[-1] is not STOP_EVENTS:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            
+            tracked = 0
+            for item in batch:
+                if item is STOP_EVENTS:
+                    return
+                if isinstance(item, Future):
+                    item.set_result(self.client.flush() or [])
+                    continue
+                tracker, event_type, properties = item
+                try:
+                    self.client.track(tracker._build_event(event_type, properties))
+                    tracked += 1
+                except Exception as e:
+                    tracker._log_send_error(event_type, properties, e)
+            if tracked:
+                log.debug("📊 ✅ Sent %d events to Amplitude", tracked)
+
+@lru_cache(maxsize=None)
+def get_amplitude_worker(api_key: str, server_url: Optional[str] = None) -> AmplitudeEventWorker:
+    """Return the event worker for an API key and server URL, shared by every tracker that uses them."""
+    from amplitude import Amplitude, Config
+    
+    # The SDK sends queued events in batches of up to 30, or every 2 seconds
+    configuration = Config(flush_queue_size=30, flush_interval_millis=2000)
+    
+    # Configure Amplitude client with custom server URL if provided
+    if server_url:
+        configuration.server_url = server_url
+        log.info("📊 Amplitude Analytics initialized with API key: %s... and custom server URL: %s", api_key[:8], server_url)
+    else:
+        log.info("📊 Amplitude Analytics initialized with API key: %s...", api_key[:8])
+    
+    # Reuse connections between batches
+    use_pooled_amplitude_transport()
+    
+    return AmplitudeEventWorker(Amplitude(api_key, configuration))
 
 class AgentAnalyticsTracker:
     """Real analytics tracker using Amplitude."""
+    
+    # Property names for each event, matched positionally by the values its emit_* method builds
+    _RUN_STARTED_KEYS = ("agent_id", "agent_run_id", "model_name", "temperature", "prompt_hash")
+    _USER_MESSAGE_KEYS = ("agent_run_id", "message_id", "message_content")
+    _AGENT_MESSAGE_KEYS = (
+        "agent_run_id", "message_id", "message_content", "model_name", "temperature",
+        "input_tokens", "output_tokens", "cost_usd", "latency_ms", "ttfb_ms", "cache_hit",
+    )
+    _TOOL_CALLED_KEYS = ("agent_run_id", "tool_name", "tool_success", "latency_ms", "tokens")
+    _RUN_COMPLETED_KEYS = ("agent_run_id", "total_tokens", "total_cost_usd", "p_95_ttfb_ms", "completion_quality_score")
+    
     def __init__(self, run_context, api_key="demo_key", server_url=None):
         self.run_context = run_context
         self.api_key = api_key
         self.server_url = server_url
         
-        # Initialize Amplitude client
+        # Session properties sent with every event; the run context is immutable, so build them once
+        session = run_context.session
+        self._base_props = {
+            "app_id": str(session.app_id),
+            "device_id": session.device_id,
+            "org_id": str(session.org_id),
+            "session_id": session.session_id,
+        }
+        self._session_id_int = int(session.session_id.replace('demo_session_', '')) if 'demo_session_' in session.session_id else 1
+        self._user_id = session.user_id
+        self._device_id = session.device_id
+        
+        # Events are queued and sent to Amplitude by a background worker, off the question's critical path;
+        # trackers with the same key and server share the worker and its Amplitude client
         if api_key and api_key != "demo_key":
-            # Configure Amplitude client with custom server URL if provided
-            if server_url:
-                self.client = Amplitude(api_key)
-                self.client.configuration.server_url = server_url
-                print(f"📊 Amplitude Analytics initialized with API key: {api_key[:8]}... and custom server URL: {server_url}")
-            else:
-                self.client = Amplitude(api_key)
-                print(f"📊 Amplitude Analytics initialized with API key: {api_key[:8]}...")
+            self._events: Optional[AmplitudeEventWorker] = get_amplitude_worker(api_key, server_url)
+            self.client = self._events.client
             self.enabled = True
         else:
+            self._events = None
             self.client = None
             self.enabled = False
-            print("📊 Amplitude Analytics disabled (no valid API key)")
+            log.info("📊 Amplitude Analytics disabled (no valid API key)")
     
-    def _send_event(self, event_type, properties):
-        """Send event to Amplitude using BaseEvent."""
+    def _send_event(self, event_type, properties, immediate=False):
+        """Queue an event for Amplitude; `immediate` sends it right away and returns the result."""
         if not self.enabled or not self.client:
-            print(f"📊 [DISABLED] {event_type}: {properties}")
+            log.debug("📊 [DISABLED] %s: %s", event_type, properties)
+            return
+        
+        if not immediate:
+            # Drop events while Amplitude is failing, rather than piling them up behind it
+            if amplitude_breaker.is_open:
+                log.debug("📊 Amplitude paused, dropped: %s", event_type)
+                return
+            self._events.put(self, event_type, properties)
+            log.debug("📊 ✅ Queued for Amplitude: %s", event_type)
             return
         
         try:
-            event = BaseEvent(
-                event_type=event_type,
-                user_id=self.run_context.session.user_id,
-                device_id=self.run_context.session.device_id,
-                session_id=int(self.run_context.session.session_id.replace('demo_session_', '')) if 'demo_session_' in self.run_context.session.session_id else 1,
-                event_properties=properties
-            )
-            
-            result = self.client.track(event)
+            result = self.client.track(self._build_event(event_type, properties))
+            self.client.flush()
             
             # Enhanced logging with response details
             if hasattr(result, 'status_code'):
-                print(f"📊 ✅ Sent to Amplitude: {event_type} (Status: {result.status_code})")
+                log.info("📊 ✅ Sent to Amplitude: %s (Status: %s)", event_type, result.status_code)
             else:
-                print(f"📊 ✅ Sent to Amplitude: {event_type}")
-            
-            # Log key properties (truncated for readability)
-            key_props = {k: (v[:50] + "..." if isinstance(v, str) and len(v) > 50 else v) 
-                        for k, v in properties.items() if k in ['agent_run_id', 'message_id', 'tool_name', 'model_name']}
-            print(f"   Key Properties: {key_props}")
+                log.info("📊 ✅ Sent to Amplitude: %s", event_type)
             
             # Return result for further inspection if needed
             return result
             
         except Exception as e:
-            print(f"📊 ❌ Failed to send to Amplitude: {e}")
-            print(f"   Event: {event_type}")
-            print(f"   Error Type: {type(e).__name__}")
-            print(f"   Key Properties: {properties.get('agent_run_id', 'N/A')} | {properties.get('message_id', 'N/A')}")
-            
-            # Re-raise for debugging if needed
-            if hasattr(e, 'response'):
-                print(f"   HTTP Status: {getattr(e.response, 'status_code', 'Unknown')}")
-                print(f"   HTTP Response: {getattr(e.response, 'text', 'Unknown')}")
-            
+            self._log_send_error(event_type, properties, e)
             return None
     
+    def _send_session_event(self, event_type, keys, values):
+        """Queue an event whose properties are `keys` zipped with `values`, plus the session properties."""
+        properties = dict(zip(keys, values))
+        properties.update(self._base_props)
+        self._send_event(event_type, properties)
+    
+    def _build_event(self, event_type, properties):
+        """Wrap event properties in an Amplitude BaseEvent for the current session."""
+        from amplitude import BaseEvent
+        
+        return BaseEvent(
+            event_type=event_type,
+            user_id=self._user_id,
+            device_id=self._device_id,
+            session_id=self._session_id_int,
+            event_properties=properties
+        )
+    
+    def _log_send_error(self, event_type, properties, e):
+        log.error("📊 ❌ Failed to send to Amplitude: %s", e)
+        log.error("   Event: %s", event_type)
+        log.error("   Error Type: %s", type(e).__name__)
+        log.error("   Key Properties: %s | %s", properties.get('agent_run_id', 'N/A'), properties.get('message_id', 'N/A'))
+        
+        if hasattr(e, 'response'):
+            log.error("   HTTP Status: %s", getattr(e.response, 'status_code', 'Unknown'))
+            log.error("   HTTP Response: %s", getattr(e.response, 'text', 'Unknown'))
+    
+    def flush(self, timeout: Optional[float] = None):
+        """Push everything queued so far to Amplitude; with a `timeout`, wait up to that long for it to be sent."""
+        if self._events is not None:
+            self._events.flush(timeout)
+    
     def emit_agent_run_started(self, **kwargs):
         """Emit agent_run_started event using BaseEvent with proper schema."""
-        self._send_event("agent_run_started", {
-            "agent_id": kwargs.get("agent_id"),
-            "agent_run_id": kwargs.get("run_id"),
-            "app_id": str(self.run_context.session.app_id),
-            "device_id": self.run_context.session.device_id,
-            "org_id": str(self.run_context.session.org_id),
-            "session_id": self.run_context.session.session_id,
-            "model_name": kwargs.get("model_name"),
-            "temperature": str(kwargs.get("temperature", 0.1)),
-            "prompt_hash": kwargs.get("prompt_hash", ""),
-        })
+        self._send_session_event("agent_run_started", self._RUN_STARTED_KEYS, (
+            kwargs.get("agent_id"),
+            kwargs.get("run_id"),
+            kwargs.get("model_name"),
+            str(kwargs.get("temperature", 0.1)),
+            kwargs.get("prompt_hash", ""),
+        ))
     
     def emit_user_message(self, **kwargs):
         """Emit user_message event using BaseEvent with proper schema."""
-        self._send_event("user_message", {
-            "agent_run_id": kwargs.get("run_id"),
-            "message_id": kwargs.get("message_id"),
-            "message_content": kwargs.get("message_content", ""),
-            "app_id": str(self.run_context.session.app_id),
-            "device_id": self.run_context.session.device_id,
-            "org_id": str(self.run_context.session.org_id),
-            "session_id": self.run_context.session.session_id,
-        })
+        self._send_session_event("user_message", self._USER_MESSAGE_KEYS, (
+            kwargs.get("run_id"),
+            kwargs.get("message_id"),
+            kwargs.get("message_content", ""),
+        ))
     
     def emit_agent_message(self, **kwargs):
         """Emit agent_message event using BaseEvent with proper schema."""
-        # Calculate cost
-        cost_usd = self.estimate_cost_from_tokens(
-            kwargs.get("model_name", "gpt-4o-mini"),
-            kwargs.get("input_tokens", 0),
-            kwargs.get("output_tokens", 0)
-        )
+        # Calculate cost, unless the caller already has
+        cost_usd = kwargs.get("cost_usd")
+        if cost_usd is None:
+            cost_usd = self.estimate_cost_from_tokens(
+                kwargs.get("model_name", "gpt-4o-mini"),
+                kwargs.get("input_tokens", 0),
+                kwargs.get("output_tokens", 0)
+            )
         
-        self._send_event("agent_message", {
-            "agent_run_id": kwargs.get("run_id"),
-            "message_id": kwargs.get("message_id"),
-            "message_content": kwargs.get("message_content", ""),
-            "model_name": kwargs.get("model_name"),
-            "temperature": str(kwargs.get("temperature", 0.1)),
-            "input_tokens": str(kwargs.get("input_tokens", 0)),
-            "output_tokens": str(kwargs.get("output_tokens", 0)),
-            "cost_usd": str(cost_usd),
-            "latency_ms": str(kwargs.get("latency_ms", 0)),
-            "app_id": str(self.run_context.session.app_id),
-            "device_id": self.run_context.session.device_id,
-            "org_id": str(self.run_context.session.org_id),
-            "session_id": self.run_context.session.session_id,
-        })
+        self._send_session_event("agent_message", self._AGENT_MESSAGE_KEYS, (
+            kwargs.get("run_id"),
+            kwargs.get("message_id"),
+            kwargs.get("message_content", ""),
+            kwargs.get("model_name"),
+            str(kwargs.get("temperature", 0.1)),
+            str(kwargs.get("input_tokens", 0)),
+            str(kwargs.get("output_tokens", 0)),
+            str(cost_usd),
+            str(kwargs.get("latency_ms", 0)),
+            str(kwargs.get("ttfb_ms", 0)),
+            str(kwargs.get("cache_hit", False)),
+        ))
     
     def emit_agent_tool_called(self, **kwargs):
         """Emit agent_tool_called event using BaseEvent with proper schema."""
-        self._send_event("agent_tool_called", {
-            "agent_run_id": kwargs.get("run_id"),
-            "app_id": str(self.run_context.session.app_id),
-            "device_id": self.run_context.session.device_id,
-            "org_id": str(self.run_context.session.org_id),
-            "session_id": self.run_context.session.session_id,
-            "tool_name": kwargs.get("tool_name"),
-            "tool_success": str(kwargs.get("tool_success", True)),
-            "latency_ms": str(kwargs.get("latency_ms", 0)),
-            "tokens": str(kwargs.get("tokens", 0)),
-        })
+        self._send_session_event("agent_tool_called", self._TOOL_CALLED_KEYS, (
+            kwargs.get("run_id"),
+            kwargs.get("tool_name"),
+            str(kwargs.get("tool_success", True)),
+            str(kwargs.get("latency_ms", 0)),
+            str(kwargs.get("tokens", 0)),
+        ))
     
     def emit_agent_run_completed(self, **kwargs):
         """Emit agent_run_completed event using BaseEvent with proper schema."""
-        self._send_event("agent_run_completed", {
-            "agent_run_id": kwargs.get("run_id"),
-            "app_id": str(self.run_context.session.app_id),
-            "device_id": self.run_context.session.device_id,
-            "org_id": str(self.run_context.session.org_id),
-            "session_id": self.run_context.session.session_id,
-            "total_tokens": "0",  # Placeholder - should be calculated from message events
-            "total_cost_usd": "0.0",  # Placeholder - should be calculated from message events
-            "p_95_ttfb_ms": str(kwargs.get("p95_ttfb_ms", 0)),
-            "completion_quality_score": (
-                str(kwargs.get("completion_quality_score")) 
-                if kwargs.get("completion_quality_score") is not None else None
-            ),
-        })
+        quality_score = kwargs.get("completion_quality_score")
+        self._send_session_event("agent_run_completed", self._RUN_COMPLETED_KEYS, (
+            kwargs.get("run_id"),
+            "0",  # Placeholder - should be calculated from message events
+            "0.0",  # Placeholder - should be calculated from message events
+            str(kwargs.get("p95_ttfb_ms", 0)),
+            str(quality_score) if quality_score is not None else None,
+        ))
     
     def estimate_cost_from_text(self, model_name, input_text, output_text):
         """Estimate cost from text strings."""
-        input_tokens = len(input_text.split()) * 1.3
-        output_tokens = len(output_text.split()) * 1.3
+        input_tokens = estimate_tokens(input_text, model_name)
+        output_tokens = estimate_tokens(output_text, model_name)
         return self.estimate_cost_from_tokens(model_name, input_tokens, output_tokens)
     
     def estimate_cost_from_tokens(self, model_name, input_tokens, output_tokens):
@@ -202,10 +568,10 @@ class AgentAnalyticsTracker:
     
     def test_connection(self):
         """Test the Amplitude connection by sending a simple test event."""
-        print("🧪 Testing Amplitude connection...")
+        log.info("🧪 Testing Amplitude connection...")
         
         if not self.enabled:
-            print("❌ Amplitude is disabled - cannot test connection")
+            log.error("❌ Amplitude is disabled - cannot test connection")
             return False
         
         try:
@@ -214,25 +580,25 @@ class AgentAnalyticsTracker:
                 "test_user_id": self.run_context.session.user_id,
                 "test_app_id": str(self.run_context.session.app_id),
                 "test_message": "Connection test from websearch_agent"
-            })
+            }, immediate=True)
             
             if result is not None:
-                print("✅ Amplitude connection test successful!")
+                log.info("✅ Amplitude connection test successful!")
                 return True
             else:
-                print("❌ Amplitude connection test failed!")
+                log.error("❌ Amplitude connection test failed!")
                 return False
                 
         except Exception as e:
-            print(f"❌ Amplitude connection test failed with error: {e}")
+            log.error("❌ Amplitude connection test failed with error: %s", e)
             return False
 
 def configure_agent_analytics(**kwargs):
     """Configure Amplitude analytics."""
-    print(f"📊 Amplitude Analytics configured with key: {kwargs.get('custom_api_key', 'N/A')[:8] if kwargs.get('custom_api_key') else 'N/A'}...")
+    log.info("📊 Amplitude Analytics configured with key: %s...", kwargs['custom_api_key'][:8] if kwargs.get('custom_api_key') else 'N/A')
 
 # Mock run context for demonstration - in production, use actual LangleyRunContext
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MockSession:
     app_id: str = "web_search_agent_app"
     org_id: str = "demo_org_123"
@@ -240,55 +606,54 @@ class MockSession:
     session_id: str = "demo_session_789"
     device_id: str = "demo_device_abc"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MockRunContext:
     session: MockSession
-    logger: Any = None
-
-    def __post_init__(self):
-        if self.logger is None:
-            import logging
-            self.logger = logging.getLogger(__name__)
+    logger: Any = field(default_factory=lambda: logging.getLogger(__name__))
 
 
 class AgentAnalyticsCallbackHandler(BaseCallbackHandler):
     """Callback handler to track agent analytics during Langchain execution."""
     
+    # Cheap enough to call directly on the event loop during async runs
+    run_inline = True
+    
     def __init__(self, analytics_tracker: AgentAnalyticsTracker, run_id: str, model_name: str):
         self.analytics_tracker = analytics_tracker
         self.run_id = run_id
         self.model_name = model_name
         self.current_tokens = {"input": 0, "output": 0}
-        self.tool_start_time = None
+        self.tool_start_times: Dict[Any, float] = {}  # By tool run ID, since one step's tool calls run concurrently
+        self.first_token_time = None  # When the first streamed LLM token arrived
+        self.streamed_tokens = 0  # Streamed LLM tokens, about one token per chunk
         
     def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
         """Called when a tool starts running."""
-        self.tool_start_time = time.time()
+        self.tool_start_times[kwargs.get("run_id")] = time.perf_counter()
         tool_name = serialized.get("name", "unknown_tool")
-        print(f"🔧 Tool started: {tool_name}")
+        log.debug("🔧 Tool started: %s", tool_name)
         
     def on_tool_end(self, output: str, **kwargs: Any) -> None:
         """Called when a tool finishes running."""
-        if self.tool_start_time:
-            latency_ms = (time.time() - self.tool_start_time) * 1000
+        start_time = self.tool_start_times.pop(kwargs.get("run_id"), None)
+        if start_time is not None:
+            latency_ms = (time.perf_counter() - start_time) * 1000
             tool_name = kwargs.get("name", "web_search")
             
-            # Estimate tokens used by tool (rough estimate)
-            estimated_tokens = len(output.split()) * 1.3  # Rough token estimation
-            
             self.analytics_tracker.emit_agent_tool_called(
                 run_id=self.run_id,
                 tool_name=tool_name,
                 tool_success=True,
                 latency_ms=latency_ms,
-                tokens=int(estimated_tokens)
+                tokens=estimate_tokens(output, self.model_name)  # Tokens the tool output adds to the prompt
             )
-            print(f"✅ Tool completed: {tool_name} ({latency_ms:.0f}ms)")
+            log.info("✅ Tool completed: %s (%.0fms)", tool_name, latency_ms)
             
     def on_tool_error(self, error: Exception, **kwargs: Any) -> None:
         """Called when a tool errors."""
-        if self.tool_start_time:
-            latency_ms = (time.time() - self.tool_start_time) * 1000
+        start_time = self.tool_start_times.pop(kwargs.get("run_id"), None)
+        if start_time is not None:
+            latency_ms = (time.perf_counter() - start_time) * 1000
             tool_name = kwargs.get("name", "web_search")
             
             self.analytics_tracker.emit_agent_tool_called(
@@ -298,9 +663,15 @@ class AgentAnalyticsCallbackHandler(BaseCallbackHandler):
                 latency_ms=latency_ms,
                 tokens=0
             )
-            print(f"❌ Tool failed: {tool_name} - {error}")
+            log.error("❌ Tool failed: %s - %s", tool_name, error)
 
-    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        """Called for each streamed LLM token; TTFB is the first token of text, not of a tool call."""
+        if self.first_token_time is None and token:
+            self.first_token_time = time.perf_counter()
+        self.streamed_tokens += 1
+    
+    def on_llm_end(self, response: "LLMResult", **kwargs: Any) -> None:
         """Called when LLM finishes running."""
         # Extract token usage if available
         if hasattr(response, 'llm_output') and response.llm_output:
@@ -310,6 +681,20 @@ class AgentAnalyticsCallbackHandler(BaseCallbackHandler):
                 self.current_tokens['output'] = token_usage.get('completion_tokens', 0)
 
 
+class FinalAnswerStreamHandler(BaseCallbackHandler):
+    """Callback handler that forwards tokens of the agent's final answer as they arrive."""
+    
+    run_inline = True
+    
+    def __init__(self, on_token: Callable[[str], None]):
+        self.on_token = on_token
+        
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        """Called for each streamed token; steps that call tools stream no text, so any text is the answer."""
+        if token:
+            self.on_token(token)
+
+
 class WebSearchAgent:
     """A web-searching agent with Amplitude analytics tracking."""
     
@@ -319,7 +704,11 @@ class WebSearchAgent:
         amplitude_api_key: str = "demo_key",
         model_name: str = "gpt-4o-mini",
         temperature: float = 0.1,
-        amplitude_server_url: str = None
+        amplitude_server_url: str = None,
+        http_client: Optional["httpx.Client"] = None,
+        http_async_client: Optional["httpx.AsyncClient"] = None,
+        response_cache: Optional[SemanticResponseCache] = None,
+        cache_path: Optional[str] = None
     ):
         self.openai_api_key = openai_api_key
         self.amplitude_api_key = amplitude_api_key
@@ -347,59 +736,154 @@ class WebSearchAgent:
         if amplitude_api_key != "demo_key":
             self.analytics_tracker.test_connection()
         
-        # Initialize OpenAI
-        self.llm = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            openai_api_key=openai_api_key
-        )
+        # Initialize OpenAI, reusing the caller's pooled HTTP clients when given
+        self.llm = get_llm(openai_api_key, model_name, temperature, http_client, http_async_client)
+        
+        # Near-duplicate questions are answered from this cache instead of the LLM
+        if response_cache is None:
+            response_cache = self._create_response_cache(get_embedder(openai_api_key, http_client), cache_path)
+        self.response_cache = response_cache
+        
+        # Exact repeats (after normalization) are answered before embedding the question at all
+        self.exact_cache = TTLCache(maxsize=10_000, ttl=3600)
+        self.exact_cache_lock = threading.Lock()
         
         # Set up search tools (DuckDuckGo only)
         self.search_tools = self._setup_search_tools()
         
         # Initialize memory
-        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+        self.memory = self._create_memory()
+        
+        # Build the agent once; per-question callbacks are passed at run time
+        self.agent_executor = self._build_agent_executor()
         
         # Track conversation state
         self.current_run_id = None
+        self._message_ids = itertools.count(1)
         self.session_start_time = None
-        self.conversation_history = []
-        self.search_count = 0  # Track searches per query
+        self.search_cache_hits = 0  # Searches answered from the shared search cache
+        self.search_cache_misses = 0
+        self.last_error = None  # Error from the most recent question, if any
         
-    def _setup_search_tools(self, use_serpapi: bool = False, serpapi_key: Optional[str] = None) -> List[Tool]:
+        # Session statistics; only the most recent latencies are kept, and no question or answer text
+        self._latencies_ms: "collections.deque[float]" = collections.deque(maxlen=LATENCY_HISTORY_SIZE)
+        self._ttfbs_ms: "collections.deque[float]" = collections.deque(maxlen=LATENCY_HISTORY_SIZE)
+        self._total_interactions = 0
+        self._successful_responses = 0
+        
+    def _create_response_cache(self, embedder: "OpenAIEmbeddings", cache_path: Optional[str]) -> SemanticResponseCache:
+        """Create the response cache, on disk at `cache_path` if given, otherwise in memory."""
+        cache_options = dict(threshold=0.92, ttl_seconds=3600, embed_batch_fn=embedder.embed_documents)
+        if cache_path:
+            try:
+                cache = PersistentSemanticCache(embedder.embed_query, cache_path, **cache_options)
+                log.info("💾 Persistent response cache: %s", cache_path)
+                return cache
+            except Exception as e:
+                log.warning("⚠️  Persistent response cache unavailable (%s); using in-memory cache", e)
+        return SemanticResponseCache(embedder.embed_query, **cache_options)
+    
+    def _setup_search_tools(self, use_serpapi: bool = False, serpapi_key: Optional[str] = None) -> List["Tool"]:
         """Set up web search tools using only DuckDuckGo."""
-        tools = []
+        from langchain.agents import Tool
         
-        # Use DuckDuckGo search (free)
-        ddg_search = DuckDuckGoSearchAPIWrapper(max_results=3)  # Limit to 3 results per search
+        tools = []
         
-        def limited_search(query: str) -> str:
-            """Wrapper to limit searches per conversation."""
-            if self.search_count >= 3:
+        def check_search(query: str) -> Optional[str]:
+            """Return a cached result or the limit message, or None if a new search may run.
+            
+            Cached results don't count against the limit.
+            """
+            with search_cache_lock:
+                cached = search_cache.get(query)
+            if cached is not None:
+                self.search_cache_hits += 1
+                log.info("🔍 Search (cached): %s", query)
+                return cached
+            
+            counter = search_count.get([0])
+            if counter[0] >= 3:
                 return "Search limit reached (3 searches per query). Please use the information already gathered or ask a new question."
             
-            self.search_count += 1
-            print(f"🔍 Search {self.search_count}/3: {query}")
+            counter[0] += 1
+            self.search_cache_misses += 1
+            log.info("🔍 Search %d/3: %s", counter[0], query)
+            return None
+        
+        def run_search(query: str) -> str:
+            """Search DuckDuckGo (free) and cache the result."""
             try:
-                result = ddg_search.run(query)
-                return result
+                result = get_ddg_search().run(query)
             except Exception as e:
                 return f"Search failed: {str(e)}"
+            with search_cache_lock:
+                search_cache[query] = result
+            return result
+        
+        def limited_search(query: str) -> str:
+            """Wrapper to limit searches per conversation."""
+            result = check_search(query)
+            return result if result is not None else run_search(query)
+        
+        async def alimited_search(query: str) -> str:
+            """Async variant of limited_search; the blocking DuckDuckGo request runs on a worker thread.
+            
+            The async executor runs the tool calls of one step concurrently.
+            """
+            result = check_search(query)
+            return result if result is not None else await asyncio.to_thread(run_search, query)
         
         tools.append(
             Tool(
-                name="DuckDuckGo Search",
-                description="Search the web using DuckDuckGo. Use this for current information, facts, and general knowledge. You have a maximum of 3 searches per user query - use them wisely!",
+                name="duckduckgo_search",
+                description=(
+                    "Search the web using DuckDuckGo. Use this for current information, facts, and general knowledge. "
+                    "You have a maximum of 3 searches per user query - use them wisely!"
+                ),
                 func=limited_search,
+                coroutine=alimited_search,
             )
         )
         
         return tools
     
+    def _create_memory(self) -> "ConversationTokenBufferMemory":
+        """Create conversation memory; only the most recent turns that fit the token limit are sent back to the model."""
+        from langchain.memory import ConversationTokenBufferMemory
+        
+        return ConversationTokenBufferMemory(
+            llm=self.llm,
+            max_token_limit=1024,
+            memory_key="chat_history",
+            return_messages=True
+        )
+    
+    def _build_agent_executor(self) -> "AgentExecutor":
+        """Initialize the OpenAI tool-calling agent with tools and memory."""
+        from langchain.agents import AgentExecutor, create_openai_tools_agent
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+        
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", AGENT_SYSTEM_PROMPT),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad"),
+        ])
+        agent = create_openai_tools_agent(self.llm, self.search_tools, prompt)
+        
+        return AgentExecutor(
+            agent=agent,
+            tools=self.search_tools,
+            memory=self.memory,
+            verbose=True,
+            handle_parsing_errors=True
+        )
+    
     def start_conversation(self) -> str:
         """Start a new conversation session."""
         self.current_run_id = str(uuid.uuid4())
-        self.session_start_time = time.time()
+        self._message_ids = itertools.count(1)
+        self.session_start_time = time.perf_counter()
         session_id = str(uuid.uuid4())
         
         # Emit run started event
@@ -413,128 +897,310 @@ class WebSearchAgent:
             tools_available=len(self.search_tools)
         )
         
-        print(f"🤖 Web Search Agent started!")
-        print(f"📊 Analytics tracking enabled with run ID: {self.current_run_id}")
-        print(f"🔍 Available search tools: {[tool.name for tool in self.search_tools]}")
-        print(f"🧠 Using model: {self.model_name} (temp: {self.temperature})")
-        print("-" * 60)
+        log.info("🤖 Web Search Agent started!")
+        log.info("📊 Analytics tracking enabled with run ID: %s", self.current_run_id)
+        log.info("🔍 Available search tools: %s", [tool.name for tool in self.search_tools])
+        log.info("🧠 Using model: %s (temp: %s)", self.model_name, self.temperature)
+        log.info(SEPARATOR)
         
         return self.current_run_id
     
-    def ask_question(self, question: str) -> str:
-        """Ask the agent a question and get a response with web search."""
+    def ask_question(
+        self,
+        question: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        no_cache: bool = False,
+        embedding: Optional[np.ndarray] = None
+    ) -> str:
+        """Ask the agent a question and get a response with web search.
+        
+        If `on_token` is given, it is called with each token of the final answer as it streams in.
+        Pass `no_cache=True` to bypass the semantic response cache (e.g. for sensitive prompts),
+        or a precomputed `embedding` of the question to skip embedding it again.
+        The cache is only used at the start of a conversation, since follow-ups depend on its history.
+        """
+        self._start_question(question)
+        
+        # Serve repeated and near-duplicate questions from the cache
+        if no_cache or self._has_history(self.memory):
+            embedding = None
+        else:
+            embedding, cached_response = self._lookup_cached_response(question, embedding)
+            if cached_response is not None:
+                self._record_cached_response(question, cached_response, on_token)
+                return cached_response
+        
+        # Reset search count for new query
+        search_count.set([0])
+        
+        # Measure response time
+        start_time = time.perf_counter()
+        
+        try:
+            # Get response from agent; run-time callbacks propagate to LLM and tool calls
+            callbacks = self._build_callbacks(on_token)
+            result = self.agent_executor.invoke({"input": question}, config={"callbacks": callbacks})
+            return self._record_answer(question, result["output"], start_time, embedding, callbacks[0])
+        except Exception as e:
+            return self._record_error(question, e, start_time)
+    
+    async def aask_question(
+        self,
+        question: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        no_cache: bool = False,
+        embedding: Optional[np.ndarray] = None,
+        executor: Optional["AgentExecutor"] = None
+    ) -> str:
+        """Async variant of ask_question; searches and LLM calls don't block the event loop.
+        
+        `executor` overrides the agent's executor, e.g. one with its own memory.
+        """
+        executor = executor or self.agent_executor
+        self._start_question(question)
+        
+        if no_cache or self._has_history(executor.memory):
+            embedding = None
+        else:
+            embedding, cached_response = await asyncio.to_thread(self._lookup_cached_response, question, embedding)
+            if cached_response is not None:
+                self._record_cached_response(question, cached_response, on_token, executor.memory)
+                return cached_response
+        
+        search_count.set([0])
+        start_time = time.perf_counter()
+        
+        try:
+            callbacks = self._build_callbacks(on_token)
+            result = await executor.ainvoke({"input": question}, config={"callbacks": callbacks})
+            return self._record_answer(question, result["output"], start_time, embedding, callbacks[0])
+        except Exception as e:
+            return self._record_error(question, e, start_time)
+    
+    def _next_message_id(self) -> str:
+        """Return a message ID unique to this run; the run ID is a UUID, so no per-message UUID is needed."""
+        return f"{self.current_run_id}-{next(self._message_ids)}"
+    
+    def _start_question(self, question: str) -> None:
+        """Start the conversation if needed and track the user's message."""
         if not self.current_run_id:
             self.start_conversation()
         
-        print(f"👤 User: {question}")
+        log.info("👤 User: %s", question)
         
         # Track user message
-        user_message_id = str(uuid.uuid4())
+        user_message_id = self._next_message_id()
         self.analytics_tracker.emit_user_message(
             run_id=self.current_run_id,
             message_id=user_message_id,
             message_content=question
         )
         
-        # Set up callback handler for this interaction
-        callback_handler = AgentAnalyticsCallbackHandler(
-            self.analytics_tracker, 
-            self.current_run_id, 
-            self.model_name
-        )
+        self.last_error = None
+    
+    def _build_callbacks(self, on_token: Optional[Callable[[str], None]] = None) -> List[BaseCallbackHandler]:
+        """Set up callback handlers for one interaction; the analytics handler comes first."""
+        callbacks = [
+            AgentAnalyticsCallbackHandler(
+                self.analytics_tracker, 
+                self.current_run_id, 
+                self.model_name
+            )
+        ]
+        if on_token is not None:
+            callbacks.append(FinalAnswerStreamHandler(on_token))
+        return callbacks
+    
+    def _record_answer(
+        self,
+        question: str,
+        response: str,
+        start_time: float,
+        embedding: Optional[np.ndarray] = None,
+        analytics_handler: Optional[AgentAnalyticsCallbackHandler] = None
+    ) -> str:
+        """Track a successful answer, add it to the history and cache, and return it."""
+        # Calculate timing; TTFB is when the LLM streamed its first token
+        response_latency_ms = (time.perf_counter() - start_time) * 1000
+        first_token_time = analytics_handler.first_token_time if analytics_handler else None
+        ttfb_ms = (first_token_time - start_time) * 1000 if first_token_time is not None else response_latency_ms
         
-        # Initialize agent with tools and memory
-        agent = initialize_agent(
-            tools=self.search_tools,
-            llm=self.llm,
-            agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
-            memory=self.memory,
-            callbacks=[callback_handler],
-            verbose=True,
-            handle_parsing_errors=True
+        # Estimate tokens (since we don't have exact counts from the agent);
+        # streamed tokens cover every LLM step, not just the final answer
+        estimated_input_tokens = estimate_tokens(question, self.model_name)
+        streamed_tokens = analytics_handler.streamed_tokens if analytics_handler else 0
+        estimated_output_tokens = streamed_tokens or estimate_tokens(response, self.model_name)
+        cost_usd = self.analytics_tracker.estimate_cost_from_tokens(self.model_name, estimated_input_tokens, estimated_output_tokens)
+        
+        # Track agent message
+        agent_message_id = self._next_message_id()
+        self.analytics_tracker.emit_agent_message(
+            run_id=self.current_run_id,
+            message_id=agent_message_id,
+            message_content=response,
+            model_name=self.model_name,
+            temperature=self.temperature,
+            input_tokens=estimated_input_tokens,
+            output_tokens=estimated_output_tokens,
+            cost_usd=cost_usd,
+            latency_ms=response_latency_ms,
+            ttfb_ms=ttfb_ms
         )
         
-        # Reset search count for new query
-        self.search_count = 0
+        log.info("🤖 Agent: %s", response)
+        log.info("⏱️  Response time: %.0fms (first token after %.0fms)", response_latency_ms, ttfb_ms)
+        log.info("💰 Estimated cost: $%.6f", cost_usd)
+        log.info(SEPARATOR)
         
-        # Measure response time
-        start_time = time.time()
+        # Update the session statistics
+        self._record_turn(response_latency_ms, ttfb_ms)
+        
+        if embedding is not None:
+            self._cache_response(question, embedding, response)
+        
+        return response
+    
+    def _record_error(self, question: str, error: Exception, start_time: float) -> str:
+        """Track a failed interaction and return the error message shown to the user."""
+        error_msg = f"Sorry, I encountered an error: {str(error)}"
+        self.last_error = str(error)
+        log.error("❌ Error: %s", error_msg)
+        self._total_interactions += 1
+        
+        # Still track the failed interaction
+        agent_message_id = self._next_message_id()
+        self.analytics_tracker.emit_agent_message(
+            run_id=self.current_run_id,
+            message_id=agent_message_id,
+            message_content=error_msg,
+            model_name=self.model_name,
+            temperature=self.temperature,
+            input_tokens=estimate_tokens(question, self.model_name),
+            output_tokens=estimate_tokens(error_msg, self.model_name),
+            latency_ms=(time.perf_counter() - start_time) * 1000,
+            error_occurred="true",
+            error_message=str(error)
+        )
+        
+        return error_msg
+    
+    async def ask_questions(self, questions: List[str], max_concurrency: int = 4) -> List[str]:
+        """Answer independent questions concurrently, embedding them for the cache in one batch.
         
+        Each question gets its own memory, so concurrent answers don't leak into each other's history.
+        Answers are returned in the order of `questions`.
+        """
         try:
-            # Get response from agent
-            response = agent.run(question)
-            
-            # Calculate timing
-            response_latency_ms = (time.time() - start_time) * 1000
-            
-            # Estimate tokens (since we don't have exact counts from the agent)
-            estimated_input_tokens = len(question.split()) * 1.3
-            estimated_output_tokens = len(response.split()) * 1.3
-            
-            # Track agent message
-            agent_message_id = str(uuid.uuid4())
-            self.analytics_tracker.emit_agent_message(
-                run_id=self.current_run_id,
-                message_id=agent_message_id,
-                message_content=response,
-                model_name=self.model_name,
-                temperature=self.temperature,
-                input_tokens=int(estimated_input_tokens),
-                output_tokens=int(estimated_output_tokens),
-                latency_ms=response_latency_ms
-            )
-            
-            print(f"🤖 Agent: {response}")
-            print(f"⏱️  Response time: {response_latency_ms:.0f}ms")
-            print(f"💰 Estimated cost: ${self.analytics_tracker.estimate_cost_from_text(self.model_name, question, response):.6f}")
-            print("-" * 60)
-            
-            # Store in conversation history
-            self.conversation_history.append({
-                'user_message': question,
-                'agent_response': response,
-                'timestamp': datetime.now(),
-                'latency_ms': response_latency_ms
-            })
-            
-            return response
-            
+            embeddings = await asyncio.to_thread(self.response_cache.embed_many, questions)
         except Exception as e:
-            error_msg = f"Sorry, I encountered an error: {str(e)}"
-            print(f"❌ Error: {error_msg}")
-            
-            # Still track the failed interaction
-            agent_message_id = str(uuid.uuid4())
-            self.analytics_tracker.emit_agent_message(
-                run_id=self.current_run_id,
-                message_id=agent_message_id,
-                message_content=error_msg,
-                model_name=self.model_name,
-                temperature=self.temperature,
-                input_tokens=int(len(question.split()) * 1.3),
-                output_tokens=int(len(error_msg.split()) * 1.3),
-                latency_ms=(time.time() - start_time) * 1000,
-                error_occurred="true",
-                error_message=str(e)
-            )
-            
-            return error_msg
+            log.warning("⚠️  Batch embedding skipped: %s", e)
+            embeddings = [None] * len(questions)
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def ask(question: str, embedding: Optional[np.ndarray]) -> str:
+            executor = self.agent_executor.model_copy(update={"memory": self._create_memory()})
+            async with semaphore:
+                return await self.aask_question(question, embedding=embedding, executor=executor)
+        
+        return await asyncio.gather(*(ask(q, e) for q, e in zip(questions, embeddings)))
+    
+    @staticmethod
+    def _has_history(memory: "ConversationTokenBufferMemory") -> bool:
+        """Whether the conversation already has turns, so answers may depend on them.
+        
+        Cached answers are keyed by the question alone, so they are only reused and stored
+        for a conversation's first question.
+        """
+        return bool(memory.chat_memory.messages)
+    
+    def _lookup_cached_response(self, question: str, embedding: Optional[np.ndarray] = None):
+        """Look the question up in the exact, then the semantic cache; returns (embedding, response).
+        
+        The question is embedded for the semantic lookup unless an embedding is given.
+        """
+        namespace = self.run_context.session.app_id
+        with self.exact_cache_lock:
+            cached = self.exact_cache.get((namespace, normalize_question(question)))
+        if cached is not None:
+            return embedding, cached
+        
+        if embedding is None:
+            try:
+                embedding = self.response_cache.embed(question)
+            except Exception as e:
+                log.warning("⚠️  Cache lookup skipped: %s", e)
+                return None, None
+        return embedding, self.response_cache.lookup(embedding, namespace=namespace)
+    
+    def _cache_response(self, question: str, embedding: np.ndarray, response: str) -> None:
+        """Store an answer in both the exact and the semantic cache."""
+        namespace = self.run_context.session.app_id
+        with self.exact_cache_lock:
+            self.exact_cache[(namespace, normalize_question(question))] = response
+        self.response_cache.add(embedding, response, namespace=namespace)
+    
+    def _record_cached_response(
+        self,
+        question: str,
+        response: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        memory: Optional["ConversationTokenBufferMemory"] = None
+    ) -> None:
+        """Track a cache hit like a regular answer, without any LLM or search calls."""
+        if on_token is not None:
+            on_token(response)
+        
+        # Keep the conversation memory consistent with what the user saw
+        (memory or self.memory).save_context({"input": question}, {"output": response})
+        
+        self.analytics_tracker.emit_agent_message(
+            run_id=self.current_run_id,
+            message_id=self._next_message_id(),
+            message_content=response,
+            model_name=self.model_name,
+            temperature=self.temperature,
+            input_tokens=0,
+            output_tokens=0,
+            latency_ms=0,
+            cache_hit=True
+        )
+        
+        log.info("🤖 Agent (cached): %s", response)
+        log.info(SEPARATOR)
+        
+        self._record_turn(0, 0)
+    
+    def _record_turn(self, latency_ms: float, ttfb_ms: float) -> None:
+        """Count a successful answer and keep its latencies for the session's p95."""
+        self._total_interactions += 1
+        self._successful_responses += 1
+        self._latencies_ms.append(latency_ms)
+        self._ttfbs_ms.append(ttfb_ms)
+    
+    def _reset_history(self) -> None:
+        """Clear the session statistics."""
+        self._latencies_ms.clear()
+        self._ttfbs_ms.clear()
+        self._total_interactions = 0
+        self._successful_responses = 0
     
     def end_conversation(self) -> None:
         """End the current conversation and emit completion event."""
-        if not self.current_run_id or not self.session_start_time:
+        if not self.current_run_id or self.session_start_time is None:
             return
         
         # Calculate session metrics
-        total_session_time = (time.time() - self.session_start_time) * 1000
+        total_session_time = (time.perf_counter() - self.session_start_time) * 1000
         
-        # Calculate p95 TTFB (time to first byte) - simplified calculation
-        response_times = [conv['latency_ms'] for conv in self.conversation_history]
-        p95_ttfb = sorted(response_times)[int(len(response_times) * 0.95)] if response_times else 0
+        # Calculate p95 TTFB (time to first streamed token) and p95 response time
+        p95_ttfb = p95(self._ttfbs_ms)
+        p95_latency = p95(self._latencies_ms)
         
         # Simple quality score based on successful responses
-        successful_responses = len([conv for conv in self.conversation_history])
-        quality_score = min(1.0, successful_responses / max(1, len(self.conversation_history)))
+        total_interactions = self._total_interactions
+        successful_responses = self._successful_responses
+        quality_score = min(1.0, successful_responses / max(1, total_interactions))
         
         # Emit completion event
         self.analytics_tracker.emit_agent_run_completed(
@@ -542,23 +1208,33 @@ class WebSearchAgent:
             p95_ttfb_ms=p95_ttfb,
             completion_quality_score=quality_score,
             total_session_time_ms=str(total_session_time),
-            total_interactions=str(len(self.conversation_history))
+            total_interactions=str(total_interactions)
         )
+        self.analytics_tracker.flush()
         
-        print(f"📊 Session completed!")
-        print(f"🔢 Total interactions: {len(self.conversation_history)}")
-        print(f"⏱️  Total session time: {total_session_time/1000:.1f}s")
-        print(f"🎯 Quality score: {quality_score:.2f}")
-        print(f"📈 P95 response time: {p95_ttfb:.0f}ms")
+        log.info("📊 Session completed!")
+        log.info("🔢 Total interactions: %d", total_interactions)
+        log.info("⏱️  Total session time: %.1fs", total_session_time / 1000)
+        log.info("🎯 Quality score: %.2f", quality_score)
+        log.info("📈 P95 response time: %.0fms (first token: %.0fms)", p95_latency, p95_ttfb)
         
         # Reset state
         self.current_run_id = None
         self.session_start_time = None
-        self.conversation_history = []
+        self._reset_history()
 
 
-def main():
-    """Main function to run the web search agent demo."""
+async def amain():
+    """Run the web search agent demo."""
+    
+    from dotenv import load_dotenv
+    
+    # --quiet keeps only warnings and errors, e.g. for benchmarking;
+    # --debug adds per-event analytics and tool-start logs
+    if "--quiet" in sys.argv[1:]:
+        log.setLevel(logging.WARNING)
+    elif "--debug" in sys.argv[1:]:
+        log.setLevel(logging.DEBUG)
     
     # Load environment variables
     load_dotenv()
@@ -572,6 +1248,9 @@ def main():
     # LOCAL_AMPLITUDE_URL = "http://localhost:8080/amplitude"  # 👈 REPLACE WITH YOUR LOCAL AMPLITUDE BACKEND URL
     LOCAL_AMPLITUDE_URL = None  # Set to None to use default Amplitude servers
     
+    # Answers are cached on disk here so repeated questions are free across runs (None for in-memory only)
+    AGENT_CACHE_PATH = os.getenv("AGENT_CACHE_PATH", "agent_cache.db")
+    
     # Optional: SerpAPI for Google Search (more reliable than DuckDuckGo)
     SERPAPI_KEY = os.getenv("SERPAPI_API_KEY")  # Optional - get from https://serpapi.com/
     USE_SERPAPI = bool(SERPAPI_KEY)
@@ -599,7 +1278,8 @@ def main():
         amplitude_api_key=AMPLITUDE_API_KEY,
         model_name="gpt-4o-mini",  # Fast and cost-effective
         temperature=0.1,  # Low temperature for factual responses
-        amplitude_server_url=LOCAL_AMPLITUDE_URL  # 👈 Pass your local Amplitude URL here
+        amplitude_server_url=LOCAL_AMPLITUDE_URL,  # 👈 Pass your local Amplitude URL here
+        cache_path=AGENT_CACHE_PATH
     )
     
     # Start conversation
@@ -623,15 +1303,15 @@ def main():
             if user_input.lower() in ['quit', 'exit', 'q']:
                 break
             elif user_input == "":
-                # Run demo questions
-                print("🎬 Running demo questions...")
-                for i, question in enumerate(demo_questions, 1):
-                    print(f"\n--- Demo Question {i}/{len(demo_questions)} ---")
-                    agent.ask_question(question)
-                    time.sleep(1)  # Brief pause between questions
+                # Run demo questions; they are independent, so ask them concurrently
+                print(f"🎬 Running {len(demo_questions)} demo questions concurrently...")
+                await agent.ask_questions(demo_questions)
                 break
             else:
-                agent.ask_question(user_input)
+                # Print the answer as it streams in
+                print("💬 ", end="", flush=True)
+                await agent.aask_question(user_input, on_token=lambda token: print(token, end="", flush=True))
+                print()
     
     except KeyboardInterrupt:
         print("\n\n⏹️  Session interrupted by user")
@@ -647,6 +1327,11 @@ def main():
         print("\n👋 Thanks for using the Web Search Agent!")
 
 
+def main():
+    """Main function to run the web search agent demo."""
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
     
\ No newline at end of file